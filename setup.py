@@ -15,14 +15,14 @@ setup(
     extras_require={
         'plotting':  ['matplotlib', 'healpy']
     },
-    python_requires='>=2.7',
+    python_requires='>=3.5',
     license=open('LICENSE').readline().split()[0],
     classifiers=[
         'Intended Audience :: Science/Research',
         'License :: OSI Approved :: MIT License',
         'Natural Language :: English',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
         'Topic :: Scientific/Engineering',
         ],
     )
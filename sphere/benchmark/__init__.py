@@ -0,0 +1,5 @@
+from .benchmark import BENCHMARKS
+from .benchmark import run_benchmarks
+from .benchmark import compare_benchmarks
+from .benchmark import clear_caches
+from .benchmark import heavy_imports
@@ -0,0 +1,5 @@
+import sys
+
+from sphere.benchmark.benchmark import main
+
+sys.exit(main())
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+"""
+Benchmarks of the normalization, the density, the sampling, the contours and the fits of
+the FB8 distribution.
+
+Every benchmark is a setup function that returns the callable to time and is run repeat
+times, each with a fresh setup, the random seed reset and the normalization caches cleared,
+so that the timings do not depend on each other or on the order of the benchmarks. The
+results are written to JSON together with the versions of the dependencies. Two result
+files are compared with compare_benchmarks(), which flags the benchmarks whose best time
+got slower by more than a threshold.
+
+  python -m sphere.benchmark run -o before.json
+  python -m sphere.benchmark run -o after.json
+  python -m sphere.benchmark compare before.json after.json
+
+>>> results = run_benchmarks(select='log_pdf.N=1000$', repeat=2)
+>>> print(list(results['results']), len(results['results']['log_pdf.N=1000']['times']))
+['log_pdf.N=1000'] 2
+>>> print(compare_benchmarks(results, results, verbose=False))
+[]
+
+The import benchmarks time fresh interpreters, e.g. a short-lived worker that evaluates one
+density, which must not import the fitting and fallback dependencies
+
+>>> print(heavy_imports())
+[]
+"""
+
+from __future__ import print_function
+import os
+import re
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+from collections import namedtuple
+
+import numpy as np
+import scipy
+
+import sphere
+from sphere.distribution import fb8, fb8_mle, FB8Distribution
+
+# sphere.distribution deletes its attribute distribution, which "import ... as" needs before
+# Python 3.7
+_distribution = sys.modules['sphere.distribution.distribution']
+
+
+class Benchmark(namedtuple('Benchmark', ['name', 'setup', 'n', 'max_repeat'])):
+    """
+    A benchmark, where n is the number of items, e.g. values of the log_pdf, and max_repeat
+    limits the number of timings of slow benchmarks.
+    """
+    __slots__ = ()
+
+    def __new__(cls, name, setup, n=None, max_repeat=None):
+        return super(Benchmark, cls).__new__(cls, name, setup, n, max_repeat)
+
+# theta, phi, psi, kappa, beta, eta, alpha, rho of the regimes of the normalization
+REGIMES = [
+    ('FB4.kappa=10', (0., 0., 0., 10., 20., -1.)),
+    ('FB5.kappa=50', (0., 0., 0., 50., 20.)),
+    ('FB5.kappa=200', (0., 0., 0., 200., 80.)),
+    ('FB6.kappa=50', (0., 0., 0., 50., 20., 0.5)),
+    ('FB8.kappa=10', (0., 0., 0., 10., 5., 0.5, 0.5, 0.6)),
+    ('FB8.kappa=50', (0., 0., 0., 50., 20., 0.5, 0.5, 0.6)),
+    ('FB8.kappa=150', (0., 0., 0., 150., 60., 0.4, 0.5, 0.6)),
+    ('FB8.kappa=1000', (0., 0., 0., 1000., 100., 0.4, 0.5, 0.6)),
+]
+
+EXAMPLE = (0.5, 1.0, 0.3, 50., 20., 0.5, 0.5, 0.6)
+
+IMPORT_STATEMENT = ('import numpy as np; from sphere.distribution import fb8; '
+                    'fb8(0.5, 1.0, 0.3, 50., 20.).pdf(np.array([1., 0., 0.]))')
+
+# the dependencies that sphere.distribution imports right away
+BASELINE_STATEMENT = 'import numpy, scipy.special'
+
+# slow to import and not needed to evaluate a density
+HEAVY_MODULES = ('scipy.optimize', 'scipy.stats', 'scipy.integrate', 'scipy.linalg',
+                 'scipy.fft', 'sqlite3')
+
+
+def clear_caches():
+    """Clears the caches of the normalization shared by all FB8Distributions."""
+    for method in [FB8Distribution.normalize, FB8Distribution._laplace_log_normalize,
+                   FB8Distribution._grad_log_normalize,
+                   FB8Distribution._series_grad_log_normalize,
+                   FB8Distribution._log_normalize_derivatives]:
+        method.__defaults__[0].clear()
+
+
+def _python(statement):
+    """Runs statement in a fresh interpreter that imports this sphere and returns its output."""
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(sphere.__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([root] + [_ for _ in [env.get('PYTHONPATH')] if _])
+    return subprocess.check_output([sys.executable, '-c', statement], env=env, cwd=root).decode()
+
+
+def _imported(statement):
+    """Returns the HEAVY_MODULES that statement imports in a fresh interpreter."""
+    return _python(statement + '; import sys; print(" ".join(_ for _ in {!r} if _ in sys.modules))'
+                   .format(HEAVY_MODULES)).split()
+
+
+def heavy_imports(statement=IMPORT_STATEMENT, baseline=BASELINE_STATEMENT):
+    """
+    Returns the HEAVY_MODULES that statement imports in a fresh interpreter and baseline
+    does not, e.g. older versions of scipy.special import scipy.linalg themselves.
+    """
+    imported = set(_imported(baseline))
+    return [_ for _ in _imported(statement) if _ not in imported]
+
+
+def _unit_vectors(n):
+    xs = np.random.normal(size=(n, 3))
+    return xs / np.linalg.norm(xs, axis=1)[:, None]
+
+
+def _import(statement):
+    def setup():
+        return lambda: _python(statement)
+    return setup
+
+
+def _construct(n):
+    def setup():
+        xs = np.random.uniform(0, 1, (n, 8))
+        return lambda: [fb8(*_) for _ in xs]
+    return setup
+
+
+def _normalize(x):
+    def setup():
+        k = fb8(*x)
+        return lambda: k.normalize(cache=dict())
+    return setup
+
+
+def _log_normalize(x):
+    def setup():
+        k = fb8(*x)
+        return k.log_normalize
+    return setup
+
+
+def _grad_log_normalize(x):
+    def setup():
+        k = fb8(*x)
+        return k._grad_log_normalize
+    return setup
+
+
+def _log_pdf(n):
+    def setup():
+        k = fb8(*EXAMPLE)
+        k.log_normalize()
+        xs = _unit_vectors(n)
+        return lambda: k.log_pdf(xs)
+    return setup
+
+
+def _rvs(kappa, n):
+    def setup():
+        k = fb8(0.5, 1.0, 0.3, kappa, kappa / 4.)
+        return lambda: k.rvs(n)
+    return setup
+
+
+def _level(x, percentile):
+    def setup():
+        k = fb8(*x)
+        k.log_normalize()
+        return lambda: k.level(percentile)
+    return setup
+
+
+def _contour(x, percentile):
+    def setup():
+        k = fb8(*x)
+        k.level(percentile)
+        return lambda: k.contour(percentile)
+    return setup
+
+
+def _mle(x, n, fb5_only):
+    def setup():
+        xs = fb8(*x).rvs(n)
+        return lambda: fb8_mle(xs, fb5_only=fb5_only, warning='none')
+    return setup
+
+
+BENCHMARKS = (
+    [Benchmark('import.numpy', _import('import numpy')),
+     Benchmark('import.fb8.pdf', _import(IMPORT_STATEMENT)),
+     Benchmark('fb8.N=10000', _construct(10000), 10000)] +
+    [Benchmark('normalize.' + name, _normalize(x)) for name, x in REGIMES] +
+    [Benchmark('log_normalize.' + name, _log_normalize(x)) for name, x in REGIMES] +
+    [Benchmark('grad_log_normalize.' + name, _grad_log_normalize(x)) for name, x in REGIMES[:-1]] +
+    [Benchmark('log_pdf.N={}'.format(n), _log_pdf(n), n) for n in [1000, 10000, 100000, 1000000]] +
+    [Benchmark('rvs.kappa={}'.format(kappa), _rvs(kappa, 1000), 1000)
+     for kappa in [1, 10, 100, 500]] +
+    [Benchmark('level.FB5', _level((0.5, 1.0, 0.3, 50., 20.), 90)),
+     Benchmark('level.FB8', _level(EXAMPLE, 90)),
+     Benchmark('contour.FB5', _contour((0.5, 1.0, 0.3, 50., 20.), 90)),
+     Benchmark('contour.FB8', _contour(EXAMPLE, 90)),
+     Benchmark('fb8_mle.FB5.N=1000', _mle((0.5, 1.0, 0.3, 50., 20.), 1000, True), 1000),
+     Benchmark('fb8_mle.FB8.N=1000', _mle(EXAMPLE, 1000, False), 1000, max_repeat=2)])
+
+
+def _environment():
+    return dict(python=platform.python_version(), numpy=np.__version__,
+                scipy=scipy.__version__, machine=platform.machine(),
+                platform=platform.platform(), time=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                normalization_backend=repr(_distribution._normalization_backend))
+
+
+def run_benchmarks(select=None, repeat=5, seed=0, verbose=False):
+    """
+    Runs the benchmarks whose names match the regular expression select, all by default.
+
+    Input:
+      - select: regular expression searched in the names of the benchmarks
+      - repeat: number of timings of every benchmark
+      - seed: random seed set before every setup
+      - verbose: if True, the best time of every benchmark is printed
+    Output:
+      - a dict with the environment, the settings and for every benchmark the times in
+        seconds, their minimum and median and the number of items n (e.g. values of the
+        log_pdf) or None
+    """
+    results = dict()
+    for benchmark in BENCHMARKS:
+        if select is not None and not re.search(select, benchmark.name):
+            continue
+        times = []
+        for i in range(min(repeat, benchmark.max_repeat or repeat)):
+            clear_caches()
+            np.random.seed(seed)
+            func = benchmark.setup()
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        results[benchmark.name] = dict(times=times, min=min(times), median=np.median(times),
+                                       n=benchmark.n)
+        if verbose:
+            print('{:<40} {:12.6f} s'.format(benchmark.name, min(times)))
+            sys.stdout.flush()
+    return dict(environment=_environment(), repeat=repeat, seed=seed, results=results)
+
+
+def compare_benchmarks(base, new, threshold=0.2, min_time=1e-4, verbose=True):
+    """
+    Compares the best times of the benchmark results new against base, e.g. as loaded from
+    the JSON files. Returns the names of the benchmarks that are slower by more than the
+    fraction threshold and by more than min_time seconds, i.e. the regressions.
+    """
+    regressions = []
+    if verbose:
+        print('{:<40} {:>12} {:>12} {:>8}'.format('benchmark', 'base [s]', 'new [s]', 'ratio'))
+    for name in sorted(set(base['results']) & set(new['results'])):
+        t0, t1 = base['results'][name]['min'], new['results'][name]['min']
+        ratio = t1 / t0 if t0 > 0 else np.inf
+        regression = ratio > 1 + threshold and t1 - t0 > min_time
+        if regression:
+            regressions.append(name)
+        if verbose:
+            print('{:<40} {:12.6f} {:12.6f} {:8.2f}{}'.format(
+                name, t0, t1, ratio, '  REGRESSION' if regression else ''))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sphere.benchmark',
+                                     description='Benchmarks of sphere.distribution')
+    subparsers = parser.add_subparsers(dest='command')
+    run = subparsers.add_parser('run', help='run the benchmarks')
+    run.add_argument('-o', '--output', help='JSON file of the results')
+    run.add_argument('-k', '--select', help='regular expression of the benchmarks to run')
+    run.add_argument('-r', '--repeat', type=int, default=5)
+    run.add_argument('-s', '--seed', type=int, default=0)
+    compare = subparsers.add_parser('compare', help='compare two JSON files of results')
+    compare.add_argument('base')
+    compare.add_argument('new')
+    compare.add_argument('-t', '--threshold', type=float, default=0.2,
+                         help='relative slowdown that is a regression')
+    compare.add_argument('-m', '--min-time', type=float, default=1e-4,
+                         help='absolute slowdown in seconds below which timings are noise')
+    subparsers.add_parser('list', help='list the benchmarks')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run_benchmarks(args.select, args.repeat, args.seed, verbose=True)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=1)
+    elif args.command == 'compare':
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        if compare_benchmarks(base, new, args.threshold, args.min_time):
+            return 1
+    elif args.command == 'list':
+        for benchmark in BENCHMARKS:
+            print(benchmark.name)
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
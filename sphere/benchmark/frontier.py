@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+"""
+Accuracy versus cost of the methods of the FB8 normalization, to choose between them with
+evidence.
+
+Every method is a string 'name' or 'name:argument' so that it can be sent to worker
+processes and stored with the results:
+
+  - series:tol         normalize() with the series truncated at tol
+  - approx             _approx_log_normalize()
+  - laplace            _laplace_log_normalize()
+  - spa:c1, spa:c2, spa:c3
+                       saddlepoint approximations of spa
+  - numerical:epsabs   _nnormalize() with epsabs = epsrel
+  - surrogate:path     a ChebyshevSurrogate saved at path, nan outside of its box
+  - cache:directory    a NormalizationCache, timed once it holds the point
+
+log(c) of every method is compared to a reference from a product quadrature, Gauss-Legendre
+in cos(theta) times the trapezoidal rule in phi, in a frame whose pole is the mode of the
+distribution and computed in log space so that it does not overflow. Its error is estimated
+from the difference to half as many nodes and stored with the results.
+
+The sweep runs over a grid of (kappa, beta, eta, alpha, rho) in worker processes and appends
+one JSON line per point to the results file as soon as the point is done. A sweep with the
+same file skips the points and methods found there, so an interrupted sweep resumes where it
+stopped and new methods can be added later. pareto_frontiers() groups the points into regions,
+e.g. FB5 with kappa in [10, 100), and returns the methods per region that no other method
+beats in both the maximum error and the mean time.
+
+  python -m sphere.benchmark.frontier run frontier.jsonl
+  python -m sphere.benchmark.frontier report frontier.jsonl
+
+>>> import os, tempfile
+>>> path = os.path.join(tempfile.mkdtemp(), 'frontier.jsonl')
+>>> grid = [(10., 2., 1., 0., 0.), (50., 20., 0.5, 0.5, 0.6)]
+>>> records = frontier_sweep(path, grid, ['series:1e-12', 'approx', 'spa:c3'], workers=1)
+>>> print(len(records), all(r['reference_error'] < 1e-9 for r in records))
+2 True
+>>> print(max(r['methods']['series:1e-12']['error'] for r in records) < 1e-9)
+True
+>>> print(len(frontier_sweep(path, grid, ['series:1e-12', 'approx', 'spa:c3', 'laplace'], workers=1)))
+2
+>>> frontiers = pareto_frontiers(load_records(path))
+>>> print(sorted(frontiers), [_[0] for _ in frontiers['FB8.kappa=[10,100)']][-1])
+['FB5.kappa=[10,100)', 'FB8.kappa=[10,100)'] series:1e-12
+"""
+
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from scipy.special import logsumexp
+
+from sphere.distribution import fb8, spa, ChebyshevSurrogate, NormalizationCache
+from sphere.benchmark.benchmark import clear_caches
+
+
+METHODS = (['series:1e-{}'.format(_) for _ in (3, 6, 9, 12)] +
+           ['approx', 'laplace', 'spa:c1', 'spa:c2', 'spa:c3'] +
+           ['numerical:1e-{}'.format(_) for _ in (3, 6, 9)])
+
+KAPPA_EDGES = (10., 100.)
+
+# backends loaded in a worker process, by method
+_backends = dict()
+
+
+def default_grid(n=8, scale=25.):
+    """
+    Returns a grid of (kappa, beta, eta, alpha, rho) with kappa and beta in
+    scale*i + 1 for i < n, like test_example_normalization, for FB5, FB6 and FB8 shapes.
+    """
+    shapes = [(1., 0., 0.), (-1., 0., 0.), (0.5, 0., 0.), (0.5, 0.5, 0.6), (-0.5, 1.5, 1.0)]
+    values = scale * np.arange(n) + 1.
+    return [(k, b) + shape for shape in shapes for k, b in itertools.product(values, values)]
+
+
+def reference_log_normalize(x, n=200):
+    """
+    Returns log(c) for the shape x = (kappa, beta, eta, alpha, rho) by product quadrature
+    with n Gauss-Legendre nodes in cos(theta) and 2n in phi around the mode, and the
+    difference to n/2 nodes as the estimate of its error.
+    """
+    k = fb8(0., 0., 0., *x)
+    xs, fs = k._local_modes()
+    x0 = xs[np.nanargmax(fs)] if np.any(np.isfinite(fs)) else np.array([1., 0., 0.])
+    e1 = np.cross(x0, np.eye(3)[np.argmin(np.abs(x0))])
+    e1 /= np.linalg.norm(e1)
+    R = np.array([x0, e1, np.cross(x0, e1)]).T
+
+    def quadrature(n):
+        z, wz = np.polynomial.legendre.leggauss(n)
+        phi = np.arange(2 * n) * np.pi / n
+        s = np.sqrt(1 - z**2)
+        u = np.stack([np.repeat(z, 2 * n), np.outer(s, np.cos(phi)).ravel(),
+                      np.outer(s, np.sin(phi)).ravel()], -1)
+        v = np.dot(u, R.T)
+        f = k.kappa * np.dot(v, k.nu) + k.beta * (v[:, 1]**2 - k.eta * v[:, 2]**2)
+        return logsumexp(f + np.log(np.repeat(wz, 2 * n) * np.pi / n))
+
+    retval = quadrature(n)
+    return retval, abs(retval - quadrature(n // 2))
+
+
+def _method(method, k):
+    """Returns log(c) of the FB8Distribution k by method, see the module docstring."""
+    name, _, argument = method.partition(':')
+    if name == 'series':
+        return np.log(k.normalize(cache=dict(), tol=float(argument)))
+    if name == 'approx':
+        return k._approx_log_normalize()
+    if name == 'laplace':
+        return k._laplace_log_normalize(cache=dict())[0]
+    if name == 'spa':
+        return getattr(spa(k), 'log_' + argument)()
+    if name == 'numerical':
+        return np.log(k._nnormalize(epsabs=float(argument), epsrel=float(argument)))
+    if name == 'surrogate':
+        if method not in _backends:
+            _backends[method] = ChebyshevSurrogate.load(argument)
+        value = _backends[method].get(k, grad=False)
+        return np.nan if value is None else value[0]
+    if name == 'cache':
+        if method not in _backends:
+            _backends[method] = NormalizationCache(argument)
+        return _backends[method].get(k, grad=False)[0]
+    raise ValueError('Unknown method ' + method)
+
+
+def _time_method(method, x, min_time=0.01, max_repeat=5):
+    """
+    Returns log(c) by method and its best time in seconds, repeating fast methods. The
+    caches of the normalization are cleared before every call.
+    """
+    times = []
+    while True:
+        clear_caches()
+        k = fb8(0., 0., 0., *x)
+        start = time.perf_counter()
+        try:
+            with np.errstate(all='ignore'):
+                value = float(_method(method, k))
+        except (RuntimeWarning, ArithmeticError, ValueError, AssertionError,
+                np.linalg.LinAlgError):
+            value = np.nan
+        times.append(time.perf_counter() - start)
+        if sum(times) >= min_time or len(times) >= max_repeat:
+            return value, min(times)
+
+
+def _sweep_task(x, methods, reference):
+    if reference is None:
+        start = time.perf_counter()
+        log_c, error = reference_log_normalize(x)
+        reference = dict(reference=log_c, reference_error=error,
+                         reference_time=time.perf_counter() - start)
+    results = dict()
+    for method in methods:
+        value, seconds = _time_method(method, x)
+        error = abs(value - reference['reference'])
+        results[method] = dict(log_c=value, time=seconds,
+                               error=error if np.isfinite(error) else None)
+    return dict(reference, x=list(x), methods=results)
+
+
+def load_records(path):
+    """Returns the records of the results file path, merging the lines of every point."""
+    records = dict()
+    if os.path.isfile(path):
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                key = tuple(record['x'])
+                if key in records:
+                    records[key]['methods'].update(record['methods'])
+                else:
+                    records[key] = record
+    return list(records.values())
+
+
+def frontier_sweep(path, grid=None, methods=METHODS, workers=None, verbose=False):
+    """
+    Runs methods on every point of grid (see default_grid()) that the results file path
+    does not contain yet and appends the results to it.
+
+    Input:
+      - path: JSON lines file of the results, created if needed
+      - grid: sequence of (kappa, beta, eta, alpha, rho), defaults to default_grid()
+      - methods: sequence of methods, see the module docstring
+      - workers: number of worker processes, defaults to the number of cores. With
+        workers=1 everything runs in the calling process
+      - verbose: if True, the progress is printed
+    Output:
+      - all records of the results file, see load_records()
+    """
+    if grid is None:
+        grid = default_grid()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    done = dict((tuple(_['x']), _) for _ in load_records(path))
+    tasks = []
+    for x in grid:
+        x = tuple(float(_) for _ in x)
+        record = done.get(x)
+        todo = [_ for _ in methods if record is None or _ not in record['methods']]
+        if todo:
+            reference = None if record is None else dict(
+                (_, record[_]) for _ in ['reference', 'reference_error', 'reference_time'])
+            tasks.append((x, todo, reference))
+
+    with open(path, 'a') as f:
+        def write(record):
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+
+        if workers == 1:
+            for i, task in enumerate(tasks):
+                write(_sweep_task(*task))
+                if verbose:
+                    print('{}/{}'.format(i + 1, len(tasks)))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_sweep_task, *task) for task in tasks]
+                for i, future in enumerate(as_completed(futures)):
+                    write(future.result())
+                    if verbose:
+                        print('{}/{}'.format(i + 1, len(tasks)))
+    return load_records(path)
+
+
+def region(x, kappa_edges=KAPPA_EDGES):
+    """Returns the name of the region of x = (kappa, beta, eta, alpha, rho)."""
+    kappa, beta, eta, alpha, rho = x
+    if alpha != 0:
+        family = 'FB8'
+    elif eta == 1:
+        family = 'FB5'
+    elif eta == -1:
+        family = 'FB4'
+    else:
+        family = 'FB6'
+    edges = (0.,) + tuple(kappa_edges) + (np.inf,)
+    i = np.searchsorted(edges, kappa, side='right') - 1
+    return '{}.kappa=[{:g},{:g})'.format(family, edges[i], edges[i + 1])
+
+
+def pareto_frontiers(records, region=region):
+    """
+    Returns for every region the methods that are not dominated in the maximum error of
+    log(c) and the mean time over the points of the region, as a list of
+    (method, max error, mean time) ordered by time. A method that failed at any point of the
+    region has an infinite error.
+    """
+    regions = dict()
+    for record in records:
+        regions.setdefault(region(tuple(record['x'])), []).append(record)
+    retval = dict()
+    for name, _records in regions.items():
+        methods = set.intersection(*[set(_['methods']) for _ in _records])
+        costs = []
+        for method in methods:
+            errors = [_['methods'][method]['error'] for _ in _records]
+            error = np.inf if None in errors else max(errors)
+            costs.append((method, error,
+                          float(np.mean([_['methods'][method]['time'] for _ in _records]))))
+        costs.sort(key=lambda _: (_[2], _[1]))
+        frontier = []
+        for cost in costs:
+            if not frontier or cost[1] < frontier[-1][1]:
+                frontier.append(cost)
+        retval[name] = frontier
+    return retval
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sphere.benchmark.frontier',
+                                     description='Accuracy versus cost of the FB8 normalization')
+    subparsers = parser.add_subparsers(dest='command')
+    run = subparsers.add_parser('run', help='run or resume a sweep')
+    run.add_argument('path', help='JSON lines file of the results')
+    run.add_argument('-m', '--methods', nargs='+', default=METHODS)
+    run.add_argument('-n', type=int, default=8, help='grid points per axis of kappa and beta')
+    run.add_argument('-s', '--scale', type=float, default=25., help='grid spacing of kappa and beta')
+    run.add_argument('-w', '--workers', type=int)
+    report = subparsers.add_parser('report', help='print the Pareto frontier per region')
+    report.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        frontier_sweep(args.path, default_grid(args.n, args.scale), args.methods,
+                       args.workers, verbose=True)
+    elif args.command == 'report':
+        for name, frontier in sorted(pareto_frontiers(load_records(args.path)).items()):
+            print(name)
+            for method, error, seconds in frontier:
+                print('  {:<20} {:12.3g} {:12.3g} s'.format(method, error, seconds))
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
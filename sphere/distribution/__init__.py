@@ -1,10 +1,88 @@
+import os
+import sys
+import types
+import importlib
+
 from .distribution import fb8
 from .distribution import fb82
 from .distribution import fb83
 from .distribution import fb84
 from .distribution import FB8Distribution
+from .distribution import FB8Parameters
 from .distribution import fb8_mle
+from .distribution import fb8_mle_binned
 from .distribution import kent_me
-from .saddle import spa
+from .distribution import kent_me_many
+from .distribution import FB8FitTimeout
+from .distribution import fb8_modes
+from .distribution import fb8_log_likelihood
+from .distribution import fb8_grad_log_likelihood
+from .distribution import sufficient_statistics
+# cheap to import, and enables the logging of the diagnostics of the normalization
+from .diagnostics import Diagnostic
+from .diagnostics import LoggingDiagnostics
+from .diagnostics import DiagnosticsCollector
+from .diagnostics import enable_diagnostics
+from .diagnostics import disable_diagnostics
+from .diagnostics import collect_diagnostics
+
+# the other submodules import e.g. scipy.optimize, scipy.fft or sqlite3 and are only
+# imported on first use of one of their names, which keeps the import of the package fast
+_LAZY = {
+    'spa': 'saddle',
+    'spa_many': 'saddle',
+    'fb8_mle_many': 'parallel',
+    'OnlineFB8': 'online',
+    'fb8_bootstrap': 'bootstrap',
+    'fb8_likelihood_ratio_test': 'bootstrap',
+    'FB8Mixture': 'mixture',
+    'fb8_mixture_mle': 'mixture',
+    'NormalizationCache': 'cache',
+    'enable_normalization_cache': 'cache',
+    'disable_normalization_cache': 'cache',
+    'ChebyshevSurrogate': 'surrogate',
+    'chebyshev_surrogate': 'surrogate',
+    'enable_normalization_surrogate': 'surrogate',
+    'disable_normalization_surrogate': 'surrogate',
+    'MetricsRegistry': 'metrics',
+    'enable_metrics': 'metrics',
+    'disable_metrics': 'metrics',
+    'collect_metrics': 'metrics',
+    'FB8Catalog': 'catalog',
+    'fb8_catalog': 'catalog',
+}
+
+
+__all__ = [
+    'fb8', 'fb82', 'fb83', 'fb84', 'FB8Distribution', 'FB8Parameters', 'fb8_mle',
+    'fb8_mle_binned', 'kent_me', 'kent_me_many', 'FB8FitTimeout', 'fb8_modes',
+    'fb8_log_likelihood', 'fb8_grad_log_likelihood', 'sufficient_statistics',
+    'Diagnostic', 'LoggingDiagnostics', 'DiagnosticsCollector', 'enable_diagnostics',
+    'disable_diagnostics', 'collect_diagnostics',
+] + sorted(_LAZY)
+
+
+class _LazyModule(types.ModuleType):
+    """
+    The class of this module, which imports the submodule of a name of _LAZY on first use.
+    A module level __getattr__ (PEP 562) would need Python 3.7.
+    """
+    def __getattr__(self, name):
+        if name in _LAZY:
+            value = getattr(importlib.import_module('.' + _LAZY[name], self.__name__), name)
+            setattr(self, name, value)
+            return value
+        raise AttributeError('module {!r} has no attribute {!r}'.format(self.__name__, name))
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(_LAZY))
+
+
+sys.modules[__name__].__class__ = _LazyModule
+
+
+# the cache enables itself on import if FB8_CACHE_DIR is set, see cache.py
+if os.environ.get('FB8_CACHE_DIR'):
+    importlib.import_module('.cache', __name__)
+
 del distribution
-del saddle
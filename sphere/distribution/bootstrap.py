@@ -0,0 +1,205 @@
+"""
+Parametric bootstrap of FB8 fits: confidence intervals of the parameters and a likelihood
+ratio test of FB8 against FB5 (Kent).
+
+Every replicate draws a dataset from the fitted model with its own random stream and is
+refitted with a single local stage that starts from the point estimate, instead of the
+full fb8_mle. Replicates run in a pool of worker processes. A replicate only depends on
+its seed, so the results do not depend on the number of workers.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .distribution import fb8, fb8_mle, _FB8Objective, _fb8_refine
+
+
+BootstrapResult = namedtuple('BootstrapResult', ['estimate', 'low', 'high', 'replicates'])
+LRTResult = namedtuple('LRTResult', ['statistic', 'pvalue', 'pvalue_error', 'statistics'])
+
+# phi, psi and rho are angles with period 2*pi
+_PERIODIC = [1, 2, 7]
+
+
+def _params(k):
+    return np.array([k.theta, k.phi, k.psi, k.kappa, k.beta, k.eta, k.alpha, k.rho])
+
+
+def _seeds(seed, n):
+    """Returns n seeds of independent random streams spawned from seed."""
+    return [_.generate_state(1)[0] for _ in np.random.SeedSequence(seed).spawn(n)]
+
+
+def _refit(xs, starts, fb5_only):
+    """
+    Returns the parameters (8,) and the log likelihood of the best single-stage fit of xs
+    from any of starts.
+    """
+    objective = _FB8Objective(xs)
+    best = None
+    for x_start in starts:
+        _x = _fb8_refine(objective, x_start, fb5_only)
+        if best is None or _x.fun < best.fun:
+            best = _x
+    x = np.concatenate((best.x, [1., 0., 0.][len(best.x)-5:]))
+    return x, -best.fun * objective.wsum
+
+
+def _bootstrap_task(x, n, fb5_only, seeds):
+    state = np.random.get_state()
+    retval = []
+    for seed in seeds:
+        np.random.seed(seed)
+        xs = fb8(*x).rvs(n)
+        retval.append(_refit(xs, [x], fb5_only)[0])
+    np.random.set_state(state)
+    return retval
+
+
+def _lrt_statistic(xs, x5, x8):
+    """
+    Returns the likelihood ratio statistic 2*(L_FB8 - L_FB5) of xs, where FB5 is refitted
+    from x5 and FB8 from the FB5 fit and x8.
+    """
+    x5_b, l5 = _refit(xs, [x5], True)
+    _, l8 = _refit(xs, [x5_b, x8], False)
+    # FB5 is nested in FB8
+    return 2 * max(l8 - l5, 0.)
+
+
+def _lrt_task(x5, x8, n, seeds):
+    state = np.random.get_state()
+    retval = []
+    for seed in seeds:
+        np.random.seed(seed)
+        retval.append(_lrt_statistic(fb8(*x5).rvs(n), x5, x8))
+    np.random.set_state(state)
+    return retval
+
+
+def _run_batches(task, args, seeds, workers, batch_size, stop=None):
+    """
+    Runs task(*args, seeds) for consecutive batches of seeds, split over workers, and
+    returns the concatenated results. stop(results) is called after every batch and ends
+    the run early if it returns True.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if batch_size is None:
+        batch_size = 8 * workers
+    results = []
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for i in range(0, len(seeds), batch_size):
+            batch = seeds[i:i + batch_size]
+            chunks = [batch[j::workers] for j in range(workers) if batch[j::workers]]
+            if executor is None:
+                outputs = [task(*(args + (chunk,))) for chunk in chunks]
+            else:
+                futures = [executor.submit(task, *(args + (chunk,))) for chunk in chunks]
+                outputs = [future.result() for future in futures]
+            # undo the round-robin split to keep the order of the seeds
+            batch_results = [None] * len(batch)
+            for j, output in enumerate(outputs):
+                batch_results[j::workers] = output
+            results += batch_results
+            if stop is not None and stop(results):
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return results
+
+
+def fb8_bootstrap(xs, n_replicates=200, cl=0.68, fb5_only=False, workers=None, seed=None,
+                  batch_size=None):
+    """
+    Returns parametric-bootstrap confidence intervals of the parameters of the FB8 (or FB5 if
+    fb5_only) distribution fitted to xs.
+
+    Input:
+      - xs: values on the sphere, ordering is (z, x, y)
+      - n_replicates: number of simulated datasets
+      - cl: confidence level of the central intervals
+      - workers: number of worker processes, defaults to the number of cores
+      - seed: seed of the random streams of the replicates
+      - batch_size: number of replicates submitted at a time
+    Output:
+      - a BootstrapResult with the point estimate and the lower and upper limits of
+        theta, phi, psi, kappa, beta, eta, alpha, rho and the refitted parameters of all
+        replicates (n_replicates, 8). The limits are the percentiles of the replicates,
+        those of phi, psi and rho are taken of the replicates unwrapped to within pi of the
+        estimate and are not wrapped into [-pi, pi]
+
+    >>> from numpy.random import seed
+    >>> seed(1)
+    >>> xs = fb8(1.0, 0.5, 0.3, 30., 8.).rvs(300)
+    >>> result = fb8_bootstrap(xs, n_replicates=8, fb5_only=True, workers=2, seed=2)
+    >>> print(np.all(result.low[:5] < result.high[:5]), result.replicates.shape)
+    True (8, 8)
+    >>> print(np.all(result.replicates == fb8_bootstrap(xs, 8, fb5_only=True, workers=1, seed=2).replicates))
+    True
+    """
+    x = _params(fb8_mle(xs, fb5_only=fb5_only, warning='none'))
+    replicates = np.array(_run_batches(_bootstrap_task, (x, len(xs), fb5_only),
+                                       _seeds(seed, n_replicates), workers, batch_size))
+    delta = replicates - x
+    delta[:, _PERIODIC] = np.mod(delta[:, _PERIODIC] + np.pi, 2 * np.pi) - np.pi
+    low, high = np.percentile(delta, [50 * (1 - cl), 50 * (1 + cl)], axis=0)
+    return BootstrapResult(x, x + low, x + high, replicates)
+
+
+def fb8_likelihood_ratio_test(xs, n_replicates=1000, precision=None, workers=None, seed=None,
+                              batch_size=None):
+    """
+    Tests the FB5 (Kent) distribution against the FB8 distribution for xs with the
+    likelihood ratio statistic 2*(L_FB8 - L_FB5). Its distribution under FB5 is obtained by
+    a parametric bootstrap from the FB5 fit. The observed statistic and those of the
+    replicates are computed with the same single-stage refits, started from the fb8_mle fits
+    of xs.
+
+    Input:
+      - xs: values on the sphere, ordering is (z, x, y)
+      - n_replicates: maximum number of simulated datasets
+      - precision: if given, stop once the standard error of the p-value is below precision
+      - workers: number of worker processes, defaults to the number of cores
+      - seed: seed of the random streams of the replicates
+      - batch_size: number of replicates between checks of the precision
+    Output:
+      - a LRTResult with the observed statistic, the p-value (r+1)/(n+1) where r of n
+        replicates exceed the observed statistic, its binomial standard error (evaluated at
+        (r+1)/(n+2) so that it does not vanish for r = 0 or r = n) and the statistics of all
+        replicates
+
+    A small-circle distribution is clearly not a Kent distribution
+
+    >>> from numpy.random import seed
+    >>> seed(3)
+    >>> xs = fb8(1.0, 0.5, 0.3, 10., 20., -1.).rvs(200)
+    >>> result = fb8_likelihood_ratio_test(xs, n_replicates=100, precision=0.2, workers=2, seed=4,
+    ...                                    batch_size=4)
+    >>> print(result.statistic > result.statistics.max(), result.pvalue, len(result.statistics))
+    True 0.2 4
+    """
+    x5 = _params(fb8_mle(xs, fb5_only=True, warning='none'))
+    x8 = _params(fb8_mle(xs, warning='none'))
+    # the same refits as for the replicates
+    statistic = _lrt_statistic(xs, x5, x8)
+
+    def pvalue(statistics):
+        n = len(statistics)
+        r = np.sum(np.asarray(statistics) >= statistic)
+        _p = (r + 1.) / (n + 2.)
+        return (r + 1.) / (n + 1.), np.sqrt(_p * (1 - _p) / n)
+
+    stop = None
+    if precision is not None:
+        def stop(statistics):
+            return pvalue(statistics)[1] < precision
+
+    statistics = _run_batches(_lrt_task, (x5, x8, len(xs)),
+                              _seeds(seed, n_replicates), workers, batch_size, stop)
+    return LRTResult(statistic, *(pvalue(statistics) + (np.array(statistics),)))
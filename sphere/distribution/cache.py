@@ -0,0 +1,221 @@
+"""
+Persistent cache of the FB8 normalization shared by processes, e.g. the hundreds of
+workers of a batch job that fit similar sources.
+
+log(c) and its gradient wrt kappa, beta, eta, alpha, rho are stored in a SQLite database
+under a configurable directory, keyed by the parameters quantized to a grid of spacing
+resolution. The values are computed at the grid point itself and the stored gradient
+corrects them to first order, so that the error due to the quantization is of order
+resolution**2. SQLite serializes the writers and with write-ahead logging readers never
+wait for them, so any number of processes may share the cache. When it holds more than
+max_entries values, the least recently used ones are evicted. Every process keeps the
+max_memory most recently used values in memory as well.
+
+The cache is enabled with enable_normalization_cache() or by setting the environment
+variable FB8_CACHE_DIR before sphere.distribution is imported, which makes it active in
+all worker processes as well.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from . import distribution as _distribution
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS normalization (
+    ikappa INTEGER, ibeta INTEGER, ieta INTEGER, ialpha INTEGER, irho INTEGER,
+    log_c REAL, dkappa REAL, dbeta REAL, deta REAL, dalpha REAL, drho REAL,
+    accessed INTEGER,
+    PRIMARY KEY (ikappa, ibeta, ieta, ialpha, irho))
+"""
+
+
+class NormalizationCache(object):
+    """
+    Persistent cache of log_normalize() and _grad_log_normalize(), see the module docstring.
+
+    >>> import tempfile
+    >>> from sphere.distribution import fb8
+    >>> directory = tempfile.mkdtemp()
+    >>> cache = NormalizationCache(directory)
+    >>> k = fb8(0.1, 0.2, 0.3, 20., 5., 0.4, 0.5, 0.6)
+    >>> log_c, grad = cache.get(k)
+    >>> print(np.abs(log_c - k.log_normalize()) < 1e-9, np.allclose(grad, k._grad_log_normalize()))
+    True True
+    >>> print(len(NormalizationCache(directory)), NormalizationCache(directory).get(k)[0] == log_c)
+    1 True
+    """
+    filename = 'fb8_normalization.sqlite'
+
+    def __init__(self, directory, max_entries=1000000, resolution=1e-6, timeout=60.,
+                 max_memory=10000):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_memory = max_memory
+        self.resolution = resolution
+        self.timeout = timeout
+        self.path = os.path.join(directory, self.filename)
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._connection = None
+        self._pid = None
+        self._inserts = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._connect()
+
+    def _connect(self):
+        """Returns the connection of this process, connecting again after a fork."""
+        if self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                         check_same_thread=False, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(_SCHEMA)
+            connection.execute('CREATE INDEX IF NOT EXISTS accessed ON normalization (accessed)')
+            self._connection = connection
+            self._pid = os.getpid()
+            self._memory = OrderedDict()
+        return self._connection
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for _ in ['_connection', '_pid', '_lock', '_local', '_memory']:
+            del state[_]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._connection = None
+        self._pid = None
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM normalization').fetchone()[0]
+
+    @property
+    def active(self):
+        """False while this thread computes a value for the cache."""
+        return not getattr(self._local, 'busy', False)
+
+    def _quantize(self, k):
+        x = np.array([k.kappa, k.beta, k.eta, k.alpha, k.rho])
+        key = tuple(int(_) for _ in np.rint(x / self.resolution))
+        return x, key
+
+    def _compute(self, key):
+        q = np.array(key) * self.resolution
+        self._local.busy = True
+        try:
+            kq = _distribution.fb8(0., 0., 0., *q)
+            return kq.log_normalize(), np.asarray(kq._grad_log_normalize(), dtype=np.float64)
+        finally:
+            self._local.busy = False
+
+    def _lookup(self, key):
+        connection = self._connect()
+        row = connection.execute(
+            'SELECT log_c, dkappa, dbeta, deta, dalpha, drho, accessed FROM normalization '
+            'WHERE ikappa=? AND ibeta=? AND ieta=? AND ialpha=? AND irho=?', key).fetchone()
+        if row is None:
+            return None
+        now = int(time.time())
+        # refresh the access time of popular entries only once a minute
+        if now - row[6] > 60:
+            connection.execute(
+                'UPDATE normalization SET accessed=? WHERE '
+                'ikappa=? AND ibeta=? AND ieta=? AND ialpha=? AND irho=?', (now,) + key)
+        return row[0], np.array(row[1:6])
+
+    def _store(self, key, log_c, grad):
+        connection = self._connect()
+        connection.execute('INSERT OR REPLACE INTO normalization VALUES (?,?,?,?,?,?,?,?,?,?,?,?)',
+                           key + (float(log_c),) + tuple(float(_) for _ in grad) +
+                           (int(time.time()),))
+        self._inserts += 1
+        if self._inserts % 1000 == 0:
+            self.evict()
+
+    def evict(self):
+        """Deletes the least recently used entries beyond max_entries."""
+        with self._lock:
+            connection = self._connect()
+            excess = self.__len__() - self.max_entries
+            if excess > 0:
+                connection.execute(
+                    'DELETE FROM normalization WHERE rowid IN '
+                    '(SELECT rowid FROM normalization ORDER BY accessed LIMIT ?)', (excess,))
+
+    def _remember(self, key, value):
+        """Keeps value in memory, forgetting the least recently used beyond max_memory."""
+        self._memory[key] = value
+        if len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def get(self, k, grad=True):
+        """
+        Returns log(c) and its gradient wrt kappa, beta, eta, alpha, rho for the
+        FB8Distribution k, computing and storing them if needed. Both are stored together,
+        so the gradient is returned even if grad is False. The lock is not held while
+        a value is computed, so threads that need different values do not wait for each
+        other.
+        """
+        x, key = self._quantize(k)
+        with self._lock:
+            value = self._memory.get(key)
+            source = 'memory'
+            if value is not None:
+                self._memory.move_to_end(key)
+            else:
+                value = self._lookup(key)
+                source = 'database'
+                if value is not None:
+                    self._remember(key, value)
+        if value is None:
+            value = self._compute(key)
+            source = 'computed'
+            with self._lock:
+                self._store(key, *value)
+                self._remember(key, value)
+        _distribution._count('cache.lookup', source)
+        log_c, grad = value
+        dx = x - np.array(key) * self.resolution
+        return log_c + np.dot(grad, dx), grad
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute('DELETE FROM normalization')
+            self._memory = OrderedDict()
+
+
+def enable_normalization_cache(directory=None, **kwargs):
+    """
+    Makes log_normalize() and _grad_log_normalize() of all FB8Distributions use a
+    NormalizationCache under directory (defaults to FB8_CACHE_DIR or ~/.cache/fb8). The
+    keyword arguments are passed on to NormalizationCache. Returns the cache.
+    """
+    if directory is None:
+        directory = os.environ.get('FB8_CACHE_DIR',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'fb8'))
+    _distribution._normalization_backend = NormalizationCache(directory, **kwargs)
+    return _distribution._normalization_backend
+
+
+def disable_normalization_cache():
+    """Stops using an enabled NormalizationCache, leaving any other backend enabled."""
+    if isinstance(_distribution._normalization_backend, NormalizationCache):
+        _distribution._normalization_backend = None
+
+
+if os.environ.get('FB8_CACHE_DIR'):
+    enable_normalization_cache()
@@ -0,0 +1,144 @@
+"""
+Storage of fitted FB8 distributions as a NumPy structured array with one record per
+distribution, optionally with the quantities that are expensive to recompute, e.g. for
+services that load a catalog of fits on startup.
+
+The fields of a record are
+
+  - theta, phi, psi, kappa, beta, eta, alpha, rho: the parameters of fb8()
+  - log_normalize: log(c), see FB8Distribution.log_normalize()
+  - grad_log_normalize: its gradient wrt kappa, beta, eta, alpha, rho
+  - modes, log_pdf_modes: the local maxima in the frame of gamma1, gamma2, gamma3 and the
+    unnormalized log_pdf there, padded with nan, see fb8_modes()
+  - level_<percentile>: level(percentile) for every stored percentile, e.g. level_90
+
+of which only the parameters are required. A catalog is saved as a .npy file, which
+FB8Catalog.load() maps into memory, so that opening even millions of distributions takes no
+time and only the records that are accessed are read. Indexing a catalog with an integer
+returns the FB8Distribution, whose stored quantities are used instead of being recomputed,
+and indexing it with a slice or an index array returns a catalog of these records.
+
+>>> import os, tempfile
+>>> from sphere.distribution import fb8
+>>> ks = [fb8(0.1 * i, 0.2, 0.3, 10. * (i + 1), 2., 0.5, 0.4, 0.3) for i in range(3)]
+>>> catalog = fb8_catalog(ks, log_normalize=True, grad_log_normalize=True, modes=True,
+...                       percentiles=(50, 90))
+>>> path = os.path.join(tempfile.mkdtemp(), 'catalog.npy')
+>>> catalog.save(path)
+>>> loaded = FB8Catalog.load(path)
+>>> print(len(loaded), type(loaded.records).__name__, loaded.percentiles)
+3 memmap [50.0, 90.0]
+>>> k = loaded[2]
+>>> print(k, k.log_normalize() == ks[2].log_normalize(), k.level(90) == ks[2].level(90),
+...       np.allclose(k.max(), ks[2].max()))
+fb8(0.20, 0.20, 0.30, 30.00, 2.00, 0.50, 0.40, 0.30) True True True
+>>> print(len(loaded[1:]), loaded[1:][0])
+2 fb8(0.10, 0.20, 0.30, 20.00, 2.00, 0.50, 0.40, 0.30)
+"""
+
+import numpy as np
+
+from .distribution import fb8, fb8_modes, FB8Distribution
+
+PARAMETERS = ('theta', 'phi', 'psi', 'kappa', 'beta', 'eta', 'alpha', 'rho')
+
+
+class FB8Catalog(object):
+    """
+    Distributions stored in the structured array records, see the module docstring.
+    """
+    def __init__(self, records):
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.distribution(index)
+        return FB8Catalog(self.records[index])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.distribution(i)
+
+    @property
+    def percentiles(self):
+        """The percentiles of the stored levels."""
+        return [float(_[6:]) for _ in self.records.dtype.names if _.startswith('level_')]
+
+    def distribution(self, i):
+        """Returns the FB8Distribution of record i with its stored quantities."""
+        record = self.records[i]
+        names = record.dtype.names
+        k = fb8(*[record[_] for _ in PARAMETERS])
+        precomputed = dict()
+        if 'log_normalize' in names:
+            precomputed['log_normalize'] = float(record['log_normalize'])
+        if 'grad_log_normalize' in names:
+            precomputed['grad_log_normalize'] = np.array(record['grad_log_normalize'])
+        levels = dict((p, float(record['level_{:g}'.format(p)])) for p in self.percentiles)
+        if levels:
+            precomputed['levels'] = levels
+        if precomputed:
+            k._precomputed = precomputed
+        if 'modes' in names:
+            fs = record['log_pdf_modes']
+            ok = np.isfinite(fs)
+            k._modes = np.array(record['modes'][ok]), np.array(fs[ok])
+        return k
+
+    def save(self, path):
+        np.save(path, self.records)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Returns the catalog saved at path, memory mapped with mmap_mode, see numpy.load.
+        With mmap_mode=None it is read into memory.
+        """
+        return cls(np.load(path, mmap_mode=mmap_mode))
+
+    def __repr__(self):
+        return 'FB8Catalog({} distributions, fields {})'.format(
+            len(self), ', '.join(self.records.dtype.names))
+
+
+def fb8_catalog(distributions, log_normalize=False, grad_log_normalize=False, modes=False,
+                percentiles=()):
+    """
+    Returns the FB8Catalog of distributions, a sequence of FB8Distributions or a single one.
+
+    Input:
+      - distributions: FB8Distribution or sequence of them
+      - log_normalize: if True, log(c) is stored
+      - grad_log_normalize: if True, the gradient of log(c) is stored
+      - modes: if True, the local maxima are stored, which gives max() and modes()
+      - percentiles: the percentiles whose level() is stored
+    """
+    if isinstance(distributions, FB8Distribution):
+        distributions = [distributions]
+    ks = list(distributions)
+    x = np.array([[getattr(k, _) for _ in PARAMETERS] for k in ks], dtype=np.float64)
+    x = x.reshape(-1, len(PARAMETERS))
+    fields = [(_, np.float64) for _ in PARAMETERS]
+    values = dict(zip(PARAMETERS, x.T))
+    if log_normalize:
+        fields.append(('log_normalize', np.float64))
+        values['log_normalize'] = [k.log_normalize() for k in ks]
+    if grad_log_normalize:
+        fields.append(('grad_log_normalize', np.float64, (5,)))
+        values['grad_log_normalize'] = [k._grad_log_normalize() for k in ks]
+    if modes:
+        nus = np.array([k.nu for k in ks]).reshape(-1, 3)
+        xs, fs = fb8_modes(x[:, 3], x[:, 4], x[:, 5], nus)
+        fields += [('modes', np.float64, xs.shape[1:]), ('log_pdf_modes', np.float64, fs.shape[1:])]
+        values['modes'], values['log_pdf_modes'] = xs, fs
+    for p in percentiles:
+        name = 'level_{:g}'.format(p)
+        fields.append((name, np.float64))
+        values[name] = [k.level(p) for k in ks]
+    records = np.empty(len(ks), dtype=fields)
+    for name, value in values.items():
+        records[name] = value
+    return FB8Catalog(records)
@@ -0,0 +1,201 @@
+"""
+Structured diagnostics of the normalization, e.g. why the series failed and which fallback
+replaced it.
+
+The normalization reports diagnostic events with a name, a logging level, the parameters
+(kappa, beta, eta, alpha, rho) of the distribution and a message that is only formatted if
+the event is passed on. An enabled handler deduplicates the events by name and region of the
+parameters, see parameter_region(), and passes on at most max_per_region events per name and
+region and at most max_events events in total per interval of seconds. The rest are counted
+and the next event passed on for the same name and region reports how many were suppressed.
+A fit that evaluates thousands of similar distributions hence reports a failing region once
+instead of once per evaluation.
+
+The event names are
+
+  - normalize.h2f1_masked: negative terms of the series masked because of an inaccuracy of
+    H2F1
+  - normalize.fallback: the FB8 series failed, the message has the reason and the fallback,
+    the asymptotic expansion or numerical integration
+  - log_normalize.fallback: the series failed, the normalization is approximated
+  - grad_log_normalize.fallback: the series of the gradient failed, it is approximated by
+    finite differences
+  - log_normalize_derivatives.fallback: the series of the Hessian failed, it is approximated
+    by finite differences
+
+By default the events are logged to the logger 'sphere.distribution' by a LoggingDiagnostics
+handler. disable_diagnostics() silences them, after which reporting an event costs a check of
+a module global. A DiagnosticsCollector keeps them in a list instead
+
+>>> from sphere.distribution import fb8
+>>> with collect_diagnostics() as diagnostics:
+...     for kappa in [1000., 1001., 1002.]:
+...         _ = fb8(0., 0., 0., kappa, 100., 0.4, 0.5, 0.6).normalize()
+>>> print([(_.name, _.region) for _ in diagnostics.diagnostics])
+[('normalize.fallback', (10, 7, 0.4, 0.5, 0.6))]
+>>> print(diagnostics.counts())
+{'normalize.fallback': {(10, 7, 0.4, 0.5, 0.6): 3}}
+>>> print(diagnostics.diagnostics[0].text())
+Series calculation of normalization failed (Series result is nan). Using asymptotic expansion... fb8(0.00, 0.00, 0.00, 1000.00, 100.00, 0.40, 0.50, 0.60)
+"""
+
+import math
+import time
+import logging
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+from . import distribution as _distribution
+
+
+class Diagnostic(namedtuple('Diagnostic', ['name', 'level', 'message', 'args', 'parameters',
+                                           'region', 'suppressed'])):
+    """
+    A diagnostic event, where parameters are (kappa, beta, eta, alpha, rho) and suppressed is
+    the number of events with the same name and region that were not passed on before it.
+    """
+    __slots__ = ()
+
+    def text(self):
+        """Returns the formatted message."""
+        return self.message % self.args
+
+
+def parameter_region(x):
+    """
+    Returns the region of x = (kappa, beta, eta, alpha, rho), the binary exponents of kappa
+    and beta and eta, alpha and rho rounded to one decimal.
+    """
+    kappa, beta, eta, alpha, rho = x
+    return (math.frexp(kappa)[1], math.frexp(beta)[1],
+            round(float(eta), 1), round(float(alpha), 1), round(float(rho), 1))
+
+
+class Diagnostics(object):
+    """
+    Deduplicates and rate limits diagnostic events, see the module docstring, and passes them
+    on to handle(), which subclasses implement. max_events=None does not limit the total and
+    with interval=None the limits apply forever.
+    All methods are thread-safe.
+    """
+    def __init__(self, max_per_region=1, max_events=100, interval=60.):
+        self.max_per_region = max_per_region
+        self.max_events = max_events
+        self.interval = interval
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # [passed on in the interval, suppressed since the last passed on, total]
+            self._regions = dict()
+            self._events = 0
+            self._start = time.monotonic()
+
+    def enabled(self, level):
+        """Returns whether events of level are handled at all."""
+        return True
+
+    def __call__(self, name, level, k, message, args):
+        if not self.enabled(level):
+            return
+        x = tuple(float(_) for _ in (k.kappa, k.beta, k.eta, k.alpha, k.rho))
+        region = parameter_region(x)
+        with self._lock:
+            if self.interval is not None and time.monotonic() - self._start >= self.interval:
+                for _ in self._regions.values():
+                    _[0] = 0
+                self._events = 0
+                self._start = time.monotonic()
+            counts = self._regions.get((name, region))
+            if counts is None:
+                counts = self._regions[name, region] = [0, 0, 0]
+            counts[2] += 1
+            if (counts[0] >= self.max_per_region or
+                    self.max_events is not None and self._events >= self.max_events):
+                counts[1] += 1
+                return
+            suppressed = counts[1]
+            counts[0] += 1
+            counts[1] = 0
+            self._events += 1
+        self.handle(Diagnostic(name, level, message, args, x, region, suppressed))
+
+    def handle(self, diagnostic):
+        raise NotImplementedError
+
+    def counts(self):
+        """Returns the number of events by name and region, including the suppressed ones."""
+        with self._lock:
+            retval = dict()
+            for (name, region), counts in self._regions.items():
+                retval.setdefault(name, dict())[region] = counts[2]
+        return retval
+
+
+class LoggingDiagnostics(Diagnostics):
+    """Logs the diagnostic events to logger, the logger 'sphere.distribution' by default."""
+    def __init__(self, logger=None, **kwargs):
+        self.logger = logging.getLogger('sphere.distribution') if logger is None else logger
+        super(LoggingDiagnostics, self).__init__(**kwargs)
+
+    def enabled(self, level):
+        return self.logger.isEnabledFor(level)
+
+    def handle(self, diagnostic):
+        message, args = diagnostic.message, diagnostic.args
+        if diagnostic.suppressed:
+            message += ' (%d similar messages suppressed)'
+            args += (diagnostic.suppressed,)
+        self.logger.log(diagnostic.level, message, *args)
+
+
+class DiagnosticsCollector(Diagnostics):
+    """
+    Keeps the diagnostic events that are passed on in the list diagnostics. By default every
+    name and region is kept once.
+    """
+    def __init__(self, max_per_region=1, max_events=None, interval=None):
+        super(DiagnosticsCollector, self).__init__(max_per_region, max_events, interval)
+
+    def reset(self):
+        super(DiagnosticsCollector, self).reset()
+        self.diagnostics = []
+
+    def handle(self, diagnostic):
+        self.diagnostics.append(diagnostic)
+
+
+def enable_diagnostics(handler=None):
+    """
+    Passes the diagnostic events to handler, a new LoggingDiagnostics by default. Returns the
+    handler.
+    """
+    if handler is None:
+        handler = LoggingDiagnostics()
+    _distribution._diagnostics = handler
+    return handler
+
+
+def disable_diagnostics():
+    _distribution._diagnostics = None
+
+
+@contextmanager
+def collect_diagnostics(handler=None):
+    """
+    Passes the diagnostic events of the with block to handler, a new DiagnosticsCollector by
+    default, which is returned by the context manager. The handler enabled before is restored
+    afterwards.
+    """
+    previous = _distribution._diagnostics
+    try:
+        yield enable_diagnostics(DiagnosticsCollector() if handler is None else handler)
+    finally:
+        _distribution._diagnostics = previous
+
+
+# the events are logged unless disabled
+if _distribution._diagnostics is None:
+    enable_diagnostics()
@@ -13,24 +13,47 @@ generates example plots if called directly from the shell.
 
 from __future__ import print_function
 import sys
+import time
 import warnings
 import logging
+import threading
+from collections import namedtuple
 
 import numpy as np
-from scipy.optimize import minimize, basinhopping, approx_fprime
-from scipy.special import gamma as G
 from scipy.special import gammaln as LG
-from scipy.special import iv as I
-from scipy.special import ivp as DI
 from scipy.special import hyp2f1 as H2F1
 from scipy.special import hyp1f1 as H1F1
 from scipy.special import hyp0f1 as H0F1
-from scipy.stats import uniform
-from scipy.integrate import dblquad, IntegrationWarning
-# to avoid confusion with the norm of a vector we give the normal distribution a less confusing name here
-from scipy.stats import norm as gauss
-import scipy.linalg
-from scipy.linalg import eig
+# scipy.optimize, scipy.integrate and scipy.linalg are slow to import and only needed to fit,
+# for the numerical fallbacks and for the moment estimates. They are imported where used
+
+# optional replacement of log_normalize and _grad_log_normalize, i.e. an object with a
+# property active and a method get(k, grad) that returns log(c) and, if grad, its gradient wrt
+# kappa, beta, eta, alpha, rho, or None if it does not cover k. See cache.py and surrogate.py
+_normalization_backend = None
+
+# optional MetricsRegistry that the code paths below record into, see metrics.py
+_metrics = None
+
+
+def _count(name, label='count', n=1):
+    if _metrics is not None:
+        _metrics.count(name, label, n)
+
+
+def _observe(name, value):
+    if _metrics is not None:
+        _metrics.observe(name, value)
+
+
+# optional handler of the diagnostic events of the normalization, see diagnostics.py
+_diagnostics = None
+
+
+def _diagnose(name, level, k, message, *args):
+    """Reports the event name of the FB8Distribution k, message % args is formatted lazily."""
+    if _diagnostics is not None:
+        _diagnostics(name, level, k, message, args)
 
 
 # helper function
@@ -54,6 +77,10 @@ def fb8(theta, phi, psi, kappa, beta, eta=1., alpha=0., rho=0.):
     eta, alpha, and rho set the additional three parameters that allow for asymmetric
     distributions.
     """
+    if (0. <= theta <= np.pi and -np.pi < phi <= np.pi and -np.pi < psi <= np.pi and
+            0. <= alpha <= np.pi and -np.pi < rho <= np.pi):
+        # the angles are those the conversion to vectors and back below returns
+        return FB8Distribution._from_parameters(theta, phi, psi, kappa, beta, eta, alpha, rho)
     gamma1, gamma2, gamma3 = FB8Distribution.spherical_coordinates_to_gammas(
         theta, phi, psi)
     nu = FB8Distribution.spherical_coordinates_to_nu(alpha, rho)
@@ -125,8 +152,264 @@ def __generate_arbitrary_orthogonal_unit_vector(x):
     return v / norm(v)
 
 
+# case index -> pairs of cell edges (0: bottom, 1: right, 2: top, 3: left) crossed by the level
+# set, the corners a, b, c, d (counter-clockwise from bottom-left) contribute 1, 2, 4, 8
+_MS_SEGMENTS = {
+    1: ((3, 0),), 2: ((0, 1),), 3: ((3, 1),), 4: ((1, 2),),
+    6: ((0, 2),), 7: ((3, 2),), 8: ((2, 3),), 9: ((0, 2),),
+    11: ((1, 2),), 12: ((3, 1),), 13: ((0, 1),), 14: ((3, 0),),
+    # saddles, (center outside, center inside)
+    5: (((3, 0), (1, 2)), ((0, 1), (2, 3))),
+    10: (((0, 1), (2, 3)), ((3, 0), (1, 2))),
+}
+
+
+def _marching_squares(values, threshold, us, vs):
+    """
+    Traces the level set values == threshold on the regular grid (vs, us) with marching
+    squares. values must have shape (len(vs), len(us)) and be padded such that every
+    contour is closed. Returns a list of closed polylines, each an array of shape (M, 2)
+    with columns (u, v) and the first point repeated at the end.
+    """
+    ny, nx = values.shape
+    inside = values >= threshold
+    case = (inside[:-1, :-1] * 1 + inside[:-1, 1:] * 2 +
+            inside[1:, 1:] * 4 + inside[1:, :-1] * 8)
+    center = values[:-1, :-1] + values[:-1, 1:] + values[1:, 1:] + values[1:, :-1] >= 4 * threshold
+    nh = ny * (nx - 1)
+
+    # edge ids for cell (i, j): bottom, right, top, left
+    def edge_ids(i, j):
+        return (i * (nx - 1) + j, nh + i * nx + j + 1,
+                (i + 1) * (nx - 1) + j, nh + i * nx + j)
+
+    segments = []
+    for c, pairs in _MS_SEGMENTS.items():
+        ii, jj = np.nonzero(case == c)
+        if ii.size == 0:
+            continue
+        eids = np.asarray(edge_ids(ii, jj))
+        if c in (5, 10):
+            for sel, _pairs in zip([~center[ii, jj], center[ii, jj]], pairs):
+                for e0, e1 in _pairs:
+                    segments.append(np.column_stack((eids[e0][sel], eids[e1][sel])))
+        else:
+            for e0, e1 in pairs:
+                segments.append(np.column_stack((eids[e0], eids[e1])))
+    if not segments:
+        return []
+    segments = np.concatenate(segments)
+
+    # linearly interpolated crossing points on every edge that is used
+    eids = np.unique(segments)
+    horizontal = eids < nh
+    i = np.where(horizontal, eids // (nx - 1), (eids - nh) // nx)
+    j = np.where(horizontal, eids % (nx - 1), (eids - nh) % nx)
+    i1 = np.where(horizontal, i, i + 1)
+    j1 = np.where(horizontal, j + 1, j)
+    v0, v1 = values[i, j], values[i1, j1]
+    frac = (threshold - v0) / (v1 - v0)
+    points = np.column_stack((us[j] + frac * (us[j1] - us[j]),
+                              vs[i] + frac * (vs[i1] - vs[i])))
+    lookup = dict(zip(eids.tolist(), range(eids.size)))
+
+    # link segments sharing an edge into closed polylines
+    neighbors = dict()
+    for e0, e1 in segments.tolist():
+        neighbors.setdefault(e0, []).append(e1)
+        neighbors.setdefault(e1, []).append(e0)
+    polylines = []
+    visited = set()
+    for start in neighbors:
+        if start in visited:
+            continue
+        line = [start]
+        visited.add(start)
+        prev, curr = None, start
+        while True:
+            nxt = [e for e in neighbors[curr] if e != prev and e not in visited]
+            if not nxt:
+                break
+            prev, curr = curr, nxt[0]
+            visited.add(curr)
+            line.append(curr)
+        line.append(start)
+        polylines.append(points[[lookup[e] for e in line]])
+    return polylines
+
+
+def _polymul(a, b):
+    """
+    helper function to multiply batches of polynomials with coefficients along the last axis
+    """
+    out = np.zeros(a.shape[:-1] + (a.shape[-1] + b.shape[-1] - 1,))
+    for i in range(a.shape[-1]):
+        out[..., i:i + b.shape[-1]] += a[..., i:i + 1] * b
+    return out
+
+
+def fb8_modes(kappa, beta, eta, nu):
+    """
+    Returns all local maxima of the unnormalized log_pdf
+    f(x) = kappa*nu.x + beta*(x2**2 - eta*x3**2) on the sphere, in the frame spanned by
+    gamma1, gamma2, gamma3. All parameters may be arrays, in which case the modes of a
+    batch of distributions are found at once.
+
+    With c = kappa*nu and d = (0, beta, -beta*eta) the stationary points satisfy
+    x_i = c_i/(2*(lam-d_i)), where the Lagrange multiplier lam is a root of
+    sum_i c_i**2/(4*(lam-d_i)**2) = 1, a polynomial of degree six. The roots are found
+    as eigenvalues of the companion matrices and polished by Newton iterations. The
+    degenerate solutions with lam = d_i, for which c_i = 0, are added separately.
+
+    Output:
+      - xs: local maxima with shape (..., M, 3), sorted by decreasing f and those of equal f
+        by decreasing x, y, z
+      - fs: values of f at the local maxima with shape (..., M)
+    M is the largest number of local maxima found in the batch, missing entries are nan.
+    If the maxima form a continuum (e.g. a small circle for eta=-1) a few representative
+    points of it are returned.
+
+    >>> xs, fs = fb8_modes(10., 0., 1., [1., 0., 0.])
+    >>> print(xs, fs)
+    [[1. 0. 0.]] [10.]
+    >>> xs, fs = fb8_modes(1., 2., 1., [1., 0., 0.])
+    >>> print(np.round(xs, 4), fs)
+    [[ 0.25    0.9682  0.    ]
+     [ 0.25   -0.9682  0.    ]] [2.125 2.125]
+    """
+    kappa, beta, eta = [np.asarray(_, dtype=np.float64) for _ in (kappa, beta, eta)]
+    nu = np.asarray(nu, dtype=np.float64)
+    shape = np.broadcast(kappa, beta, eta, nu[..., 0]).shape
+    c = (kappa[..., None] * nu * np.ones(shape + (3,))).reshape(-1, 3)
+    d = np.stack(np.broadcast_arrays(np.zeros(shape), beta, -beta * eta), -1).reshape(-1, 3)
+    nb = c.shape[0]
+    scale = np.abs(c).sum(-1) + np.abs(d).sum(-1) + 1.
+    tol = 1e-10 * scale[:, None]
+
+    # secular equation as polynomial: sum_i c_i**2 prod_{j!=i} q_j - 4 prod_j q_j = 0
+    q = np.stack([np.ones((nb, 3)), -2 * d, d**2], -1)
+    poly = -4 * _polymul(_polymul(q[:, 0], q[:, 1]), q[:, 2])
+    for i, (j, k) in enumerate([(1, 2), (0, 2), (0, 1)]):
+        poly[:, 2:] += c[:, i:i + 1]**2 * _polymul(q[:, j], q[:, k])
+    companion = np.zeros((nb, 6, 6))
+    companion[:, 0, :] = -poly[:, 1:] / poly[:, :1]
+    companion[:, np.arange(1, 6), np.arange(5)] = 1.
+    roots = np.linalg.eigvals(companion)
+    lam = np.where(np.abs(roots.imag) < 1e-6 * (1 + np.abs(roots.real)), roots.real, np.nan)
+    with np.errstate(all='ignore'):
+        for _ in range(5):
+            dl = lam[..., None] - d[:, None, :]
+            g = np.sum(c[:, None, :]**2 / (4 * dl**2), -1) - 1
+            dg = -np.sum(c[:, None, :]**2 / (2 * dl**3), -1)
+            step = g / dg
+            lam = np.where(np.isfinite(step), lam - step, lam)
+        x = c[:, None, :] / (2 * (lam[..., None] - d[:, None, :]))
+    ok = np.all(np.isfinite(x), -1) & (np.abs(norm(x, -1) - 1) < 1e-6)
+    x[~ok] = np.nan
+    lams = [lam]
+    xs = [x]
+
+    # degenerate solutions lam = d_i with the free components along d_i
+    for i in range(3):
+        same = np.abs(d - d[:, i:i + 1]) <= tol
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = np.where(same, 0., c / (2 * (d[:, i:i + 1] - d)))
+        rem = 1 - np.sum(x**2, -1)
+        ok = np.all(~same | (np.abs(c) <= tol), -1) & (rem >= 0)
+        for sgn in [-1, 1]:
+            _x = x.copy()
+            _x[:, i] = sgn * np.sqrt(np.clip(rem, 0, None))
+            _x[~ok] = np.nan
+            lams.append(d[:, i:i + 1])
+            xs.append(_x[:, None, :])
+    lam = np.concatenate(lams, -1)
+    x = np.concatenate(xs, -2)
+
+    # a stationary point is a local maximum if (D-lam) is negative semidefinite on its tangent plane
+    e1 = np.cross(x, np.eye(3)[np.nanargmin(np.abs(np.nan_to_num(x, nan=1.)), -1)])
+    e1 /= norm(e1, -1)[..., None]
+    e2 = np.cross(x, e1)
+    T = np.stack([e1, e2], -1)
+    dm = d[:, None, :, None] - lam[..., None, None]
+    curv = np.linalg.eigvalsh(np.nan_to_num(MMul(np.swapaxes(T, -2, -1), dm * T)))
+    ismax = np.all(np.isfinite(x), -1) & np.all(curv <= 1e-8 * scale[:, None, None], -1)
+    f = np.where(ismax, np.sum(c[:, None, :] * x + d[:, None, :] * x**2, -1), -np.inf)
+
+    # remove duplicates and sort, equal f (up to rounding) by x, which does not depend on the
+    # order of the eigenvalues
+    def order(f, x):
+        return np.lexsort((-x[..., 2], -x[..., 1], -x[..., 0], np.round(-f / scale[:, None], 10)))
+
+    _order = order(f, x)
+    f = np.take_along_axis(f, _order, -1)
+    x = np.take_along_axis(x, _order[..., None], -2)
+    dist = norm(np.nan_to_num(x[:, :, None, :] - x[:, None, :, :], nan=np.inf), -1)
+    dup = np.any(np.tril(dist < 1e-6, -1), -1)
+    f[dup] = -np.inf
+    _order = order(f, x)
+    f = np.take_along_axis(f, _order, -1)
+    x = np.take_along_axis(x, _order[..., None], -2)
+    nmax = max(1, np.max(np.sum(np.isfinite(f), -1)))
+    f, x = f[:, :nmax], x[:, :nmax]
+    x[~np.isfinite(f)] = np.nan
+    f[~np.isfinite(f)] = np.nan
+    return x.reshape(shape + (nmax, 3)), f.reshape(shape + (nmax,))
+
+
+class FB8Parameters(namedtuple('FB8Parameters', ['theta', 'phi', 'psi', 'kappa', 'beta',
+                                                 'eta', 'alpha', 'rho'])):
+    """
+    Immutable record of the parameters of fb8(), e.g. to keep many of them around. The
+    orientation Gamma, nu and the distribution with its caches are derived on demand.
+
+    >>> p = FB8Parameters(0.5, 1.0, 0.3, 50., 20., 0.5, 0.5, 0.6)
+    >>> k = p.distribution()
+    >>> print(k, k.parameters == p, np.allclose(p.Gamma, k.Gamma), np.allclose(p.nu, k.nu))
+    fb8(0.50, 1.00, 0.30, 50.00, 20.00, 0.50, 0.50, 0.60) True True True
+    >>> print(FB8Parameters(0.5, 1.0, 0.3, 50., 20.).distribution())
+    fb8(0.50, 1.00, 0.30, 50.00, 20.00, 1.00, 0.00, 0.00)
+    """
+    __slots__ = ()
+
+    def __new__(cls, theta, phi, psi, kappa, beta, eta=1., alpha=0., rho=0.):
+        return super(FB8Parameters, cls).__new__(cls, theta, phi, psi, kappa, beta, eta, alpha,
+                                                 rho)
+
+    @property
+    def Gamma(self):
+        return FB8Distribution.create_matrix_Gamma(self.theta, self.phi, self.psi)
+
+    @property
+    def nu(self):
+        return FB8Distribution.spherical_coordinates_to_nu(self.alpha, self.rho)
+
+    def distribution(self):
+        return fb8(*self)
+
+    def log_normalize(self):
+        """log(c), which is cached by kappa, beta, eta, alpha, rho"""
+        return FB8Distribution._from_shape(*self[3:]).log_normalize()
+
+
+# empty caches shared by all instances, which replace them instead of modifying them
+_NO_RVS = np.empty((0, 3))
+_NO_RVS.flags.writeable = False
+_NO_LEVELS = np.empty((0,))
+_NO_LEVELS.flags.writeable = False
+
+
 class FB8Distribution(object):
+    # many instances are built e.g. for maps and fits, the vectors gamma1, gamma2, gamma3 and
+    # nu are derived from the angles on first use
+    __slots__ = ('_gammas', '_nu', '_theta', '_phi', '_psi', '_kappa', '_beta', '_eta',
+                 '_alpha', '_rho', '_cached_rvs', '_level_log_pdf', '_modes', '_precomputed',
+                 '__weakref__')
+
     minimum_value_for_kappa = 1E-6
+    # smallest curvature of -log(pdf) at the modes for which log_normalize uses the
+    # asymptotic expansion instead of the series, and the smallest one at all
+    laplace_curvature = 1E3
+    minimum_laplace_curvature = 10.
 
     @staticmethod
     def create_matrix_H(theta, phi):
@@ -219,6 +502,85 @@ class FB8Distribution(object):
         else:
             return _DK
 
+    @staticmethod
+    def create_matrix_DH_theta_theta(theta, phi):
+        theta = np.asarray(theta)
+        phi = np.asarray(phi)
+        zs = np.zeros(theta.shape)
+        _DH = np.array([
+            [-np.cos(theta),          np.sin(theta),         zs],
+            [-np.sin(theta) * np.cos(phi), -np.cos(theta) * np.cos(phi), zs],
+            [-np.sin(theta) * np.sin(phi), -np.cos(theta) * np.sin(phi), zs]
+        ])
+        if len(_DH.shape) > 2:
+            return np.moveaxis(_DH, 2, 0)
+        else:
+            return _DH
+
+    @staticmethod
+    def create_matrix_DH_theta_phi(theta, phi):
+        theta = np.asarray(theta)
+        phi = np.asarray(phi)
+        zs = np.zeros(theta.shape)
+        _DH = np.array([
+            [zs, zs, zs],
+            [-np.cos(theta) * np.sin(phi), np.sin(theta) * np.sin(phi), zs],
+            [np.cos(theta) * np.cos(phi), -np.sin(theta) * np.cos(phi), zs]
+        ])
+        if len(_DH.shape) > 2:
+            return np.moveaxis(_DH, 2, 0)
+        else:
+            return _DH
+
+    @staticmethod
+    def create_matrix_DH_phi_phi(theta, phi):
+        theta = np.asarray(theta)
+        phi = np.asarray(phi)
+        zs = np.zeros(theta.shape)
+        _DH = np.array([
+            [zs, zs, zs],
+            [-np.sin(theta) * np.cos(phi), -np.cos(theta) * np.cos(phi), np.sin(phi)],
+            [-np.sin(theta) * np.sin(phi), -np.cos(theta) * np.sin(phi), -np.cos(phi)]
+        ])
+        if len(_DH.shape) > 2:
+            return np.moveaxis(_DH, 2, 0)
+        else:
+            return _DH
+
+    @staticmethod
+    def create_matrix_DK_psi_psi(psi):
+        psi = np.asarray(psi)
+        zs = np.zeros(psi.shape)
+        _DK = np.array([
+            [zs, zs, zs],
+            [zs, -np.cos(psi), np.sin(psi)],
+            [zs, -np.sin(psi), -np.cos(psi)],
+        ])
+        if len(_DK.shape) > 2:
+            return np.moveaxis(_DK, 2, 0)
+        else:
+            return _DK
+
+    @staticmethod
+    def create_matrix_D2Gamma(theta, phi, psi):
+        """
+        Returns the second derivatives of Gamma wrt theta, phi, psi as a nested 3x3 list
+        """
+        H = FB8Distribution.create_matrix_H(theta, phi)
+        DH_theta = FB8Distribution.create_matrix_DH_theta(theta, phi)
+        DH_phi = FB8Distribution.create_matrix_DH_phi(theta, phi)
+        K = FB8Distribution.create_matrix_K(psi)
+        DK_psi = FB8Distribution.create_matrix_DK_psi(psi)
+        D2Gamma_theta_theta = MMul(FB8Distribution.create_matrix_DH_theta_theta(theta, phi), K)
+        D2Gamma_theta_phi = MMul(FB8Distribution.create_matrix_DH_theta_phi(theta, phi), K)
+        D2Gamma_phi_phi = MMul(FB8Distribution.create_matrix_DH_phi_phi(theta, phi), K)
+        D2Gamma_theta_psi = MMul(DH_theta, DK_psi)
+        D2Gamma_phi_psi = MMul(DH_phi, DK_psi)
+        D2Gamma_psi_psi = MMul(H, FB8Distribution.create_matrix_DK_psi_psi(psi))
+        return [[D2Gamma_theta_theta, D2Gamma_theta_phi, D2Gamma_theta_psi],
+                [D2Gamma_theta_phi, D2Gamma_phi_phi, D2Gamma_phi_psi],
+                [D2Gamma_theta_psi, D2Gamma_phi_psi, D2Gamma_psi_psi]]
+
     @staticmethod
     def create_matrix_DGamma_theta(theta, phi, psi):
         return MMul(FB8Distribution.create_matrix_DH_theta(theta, phi), FB8Distribution.create_matrix_K(psi))
@@ -274,8 +636,7 @@ class FB8Distribution(object):
         assert k > 0
         v = jj + ll + kk + 0.5
         z = k*n1
-        with warnings.catch_warnings():
-            warnings.simplefilter('ignore')
+        with np.errstate(divide='ignore', invalid='ignore'):
             ln_n2 = np.log(n2**2) * ll
             ln_n3 = np.log(n3**2) * kk
             ln_b = np.log(b) * jj
@@ -303,9 +664,7 @@ class FB8Distribution(object):
         for gamma in gamma1, gamma2, gamma3:
             assert len(gamma) == 3
 
-        self._gamma1 = np.array(gamma1, dtype=np.float64)
-        self._gamma2 = np.array(gamma2, dtype=np.float64)
-        self._gamma3 = np.array(gamma3, dtype=np.float64)
+        self._gammas = tuple(np.array(_, dtype=np.float64) for _ in (gamma1, gamma2, gamma3))
         self._kappa = float(kappa)
         self._beta = float(beta)
         # Bingham-Mardia, 4-param, small-circle distribution has eta=-1
@@ -316,28 +675,76 @@ class FB8Distribution(object):
         self._nu = nu
 
         self._theta, self._phi, self._psi = FB8Distribution.gammas_to_spherical_coordinates(
-            self._gamma1, self._gamma2)
+            self._gammas[0], self._gammas[1])
         self._alpha, self._rho = FB8Distribution.gamma1_to_spherical_coordinates(self._nu)
 
-        self._cached_rvs = np.empty((0,3))
+        self._cached_rvs = _NO_RVS
 
         # save rvs used to calculated level contours to keep levels self-consistent
-        self._level_log_pdf = np.empty((0,))
+        self._level_log_pdf = _NO_LEVELS
+
+        # local maxima in the frame of gamma1, gamma2, gamma3 (invariant under rotations)
+        self._modes = None
+
+        # log_normalize, grad_log_normalize and levels by percentile loaded with the
+        # parameters, see catalog.py (invariant under rotations)
+        self._precomputed = None
+
+    @classmethod
+    def _from_parameters(cls, theta, phi, psi, kappa, beta, eta=1., alpha=0., rho=0.):
+        """
+        Returns an instance for the angles theta in [0, pi], phi and psi in (-pi, pi], alpha
+        in [0, pi] and rho in (-pi, pi], which are kept as they are. Unlike the constructor
+        it skips the conversions between angles and vectors, gamma1, gamma2, gamma3 and nu
+        are derived on first use.
+        """
+        assert not kappa < 0.
+        assert not beta < 0.
+        assert not abs(eta) > 1.001
+        self = cls.__new__(cls)
+        self._gammas = self._nu = self._modes = self._precomputed = None
+        self._theta, self._phi, self._psi = float(theta), float(phi), float(psi)
+        self._kappa, self._beta, self._eta = float(kappa), float(beta), float(eta)
+        self._alpha, self._rho = float(alpha), float(rho)
+        self._cached_rvs = _NO_RVS
+        self._level_log_pdf = _NO_LEVELS
+        return self
+
+    @classmethod
+    def _from_shape(cls, kappa, beta, eta, alpha, rho):
+        """
+        Returns an instance with Gamma = 1 for the shape parameters only, which suffices for
+        the normalization and its derivatives.
+        """
+        return cls._from_parameters(0., 0., 0., kappa, beta, eta, alpha, rho)
+
+    @property
+    def parameters(self):
+        return FB8Parameters(*[float(_) for _ in (self.theta, self.phi, self.psi, self.kappa,
+                                                  self.beta, self.eta, self.alpha, self.rho)])
+
+    def _orientation(self):
+        if self._gammas is None:
+            Gamma = self.create_matrix_Gamma(self._theta, self._phi, self._psi)
+            self._gammas = tuple(np.ascontiguousarray(Gamma.T))
+        return self._gammas
 
     @property
     def gamma1(self):
-        return self._gamma1
+        return self._orientation()[0]
 
     @property
     def gamma2(self):
-        return self._gamma2
+        return self._orientation()[1]
 
     @property
     def gamma3(self):
-        return self._gamma3
+        return self._orientation()[2]
 
     @property
     def nu(self):
+        if self._nu is None:
+            self._nu = FB8Distribution.spherical_coordinates_to_nu(self._alpha, self._rho)
         return self._nu
 
     @property
@@ -347,8 +754,10 @@ class FB8Distribution(object):
     @kappa.setter
     def kappa(self, val):
         self._kappa = val
-        self._level_log_pdf = np.empty((0,))
-        self._cached_rvs = np.empty((0,3))
+        self._level_log_pdf = _NO_LEVELS
+        self._cached_rvs = _NO_RVS
+        self._modes = None
+        self._precomputed = None
 
     @property
     def beta(self):
@@ -357,8 +766,10 @@ class FB8Distribution(object):
     @beta.setter
     def beta(self, val):
         self._beta = val
-        self._level_log_pdf = np.empty((0,))
-        self._cached_rvs = np.empty((0,3))
+        self._level_log_pdf = _NO_LEVELS
+        self._cached_rvs = _NO_RVS
+        self._modes = None
+        self._precomputed = None
 
     @property
     def eta(self):
@@ -367,8 +778,10 @@ class FB8Distribution(object):
     @eta.setter
     def eta(self, val):
         self._eta = val
-        self._level_log_pdf = np.empty((0,))
-        self._cached_rvs = np.empty((0,3))
+        self._level_log_pdf = _NO_LEVELS
+        self._cached_rvs = _NO_RVS
+        self._modes = None
+        self._precomputed = None
 
     @property
     def theta(self):
@@ -377,9 +790,8 @@ class FB8Distribution(object):
     @theta.setter
     def theta(self, val):
         self._theta = np.arccos(np.cos(val))
-        self._gamma1, self._gamma2, self._gamma3 = self.Gamma.T
-        self._level_log_pdf = np.empty((0,))
-        self._cached_rvs = np.empty((0,3))
+        self._gammas = None
+        self._cached_rvs = _NO_RVS
 
     @property
     def phi(self):
@@ -388,9 +800,8 @@ class FB8Distribution(object):
     @phi.setter
     def phi(self, val):
         self._phi = np.arctan2(np.sin(val), np.cos(val))
-        self._gamma1, self._gamma2, self._gamma3 = self.Gamma.T
-        self._level_log_pdf = np.empty((0,))
-        self._cached_rvs = np.empty((0,3))
+        self._gammas = None
+        self._cached_rvs = _NO_RVS
 
     @property
     def psi(self):
@@ -399,9 +810,8 @@ class FB8Distribution(object):
     @psi.setter
     def psi(self, val):
         self._psi = np.arctan2(np.sin(val), np.cos(val))
-        self._gamma1, self._gamma2, self._gamma3 = self.Gamma.T
-        self._level_log_pdf = np.empty((0,))
-        self._cached_rvs = np.empty((0,3))
+        self._gammas = None
+        self._cached_rvs = _NO_RVS
 
     @property
     def alpha(self):
@@ -410,10 +820,11 @@ class FB8Distribution(object):
     @alpha.setter
     def alpha(self, val):
         self._alpha = np.arccos(np.cos(val))
-        self._nu = FB8Distribution.spherical_coordinates_to_nu(
-            self._alpha, self._rho)
-        self._level_log_pdf = np.empty((0,))
-        self._cached_rvs = np.empty((0,3))
+        self._nu = None
+        self._level_log_pdf = _NO_LEVELS
+        self._cached_rvs = _NO_RVS
+        self._modes = None
+        self._precomputed = None
 
     @property
     def rho(self):
@@ -422,10 +833,90 @@ class FB8Distribution(object):
     @rho.setter
     def rho(self, val):
         self._rho = np.arctan2(np.sin(val), np.cos(val))
-        self._nu = FB8Distribution.spherical_coordinates_to_nu(
-            self._alpha, self._rho)
-        self._level_log_pdf = np.empty((0,))
-        self._cached_rvs = np.empty((0,3))
+        self._nu = None
+        self._level_log_pdf = _NO_LEVELS
+        self._cached_rvs = _NO_RVS
+        self._modes = None
+        self._precomputed = None
+
+    def _reoriented(self, Gamma, theta, phi, psi):
+        """
+        Returns a copy with the orientation Gamma given by theta, phi, psi that shares the
+        caches which only depend on the shape, i.e. the local modes and the percentile
+        levels. The normalization and its derivatives are cached by shape anyway.
+        """
+        new = self.__class__.__new__(self.__class__)
+        for name in FB8Distribution.__slots__[:-1]:
+            setattr(new, name, getattr(self, name))
+        new._gammas = tuple(np.array(Gamma, dtype=np.float64).T)
+        new._theta, new._phi, new._psi = theta, phi, psi
+        new._cached_rvs = _NO_RVS
+        return new
+
+    def reorient(self, theta, phi, psi):
+        """
+        Returns a copy of the distribution with the orientation theta, phi, psi and the same
+        kappa, beta, eta, alpha, rho, see _reoriented().
+        """
+        theta = np.arccos(np.cos(theta))
+        phi = np.arctan2(np.sin(phi), np.cos(phi))
+        psi = np.arctan2(np.sin(psi), np.cos(psi))
+        return self._reoriented(self.create_matrix_Gamma(theta, phi, psi), theta, phi, psi)
+
+    def rotate(self, R):
+        """
+        Returns a copy of the distribution rotated by the rotation matrix R, such that its
+        pdf at R x equals the pdf of this distribution at x.
+
+        >>> k = fb8(0.3, 1.2, -0.4, 20., 5., -0.5, 0.7, 0.4)
+        >>> R = FB8Distribution.create_matrix_Gamma(1.0, -2.0, 0.5)
+        >>> xs = k.rvs(10)
+        >>> print(np.allclose(k.rotate(R).log_pdf(np.dot(xs, R.T)), k.log_pdf(xs)))
+        True
+        """
+        Gamma = np.dot(R, self.Gamma)
+        theta, phi, psi = self.gammas_to_spherical_coordinates(Gamma[:, 0], Gamma[:, 1])
+        return self._reoriented(Gamma, float(theta), float(phi), float(psi))
+
+    def orientations(self, theta, phi, psi=0.):
+        """
+        Returns a list of copies of the distribution for every orientation of the broadcast
+        arrays theta, phi, psi, see reorient(). The Gammas are built at once and the local
+        modes are computed once for all copies.
+        """
+        self._local_modes()
+        theta, phi, psi = [np.ravel(_) for _ in np.broadcast_arrays(theta, phi, psi)]
+        theta = np.arccos(np.cos(theta))
+        phi = np.arctan2(np.sin(phi), np.cos(phi))
+        psi = np.arctan2(np.sin(psi), np.cos(psi))
+        Gammas = self.create_matrix_Gamma(theta, phi, psi)
+        return [self._reoriented(*_) for _ in zip(Gammas, theta, phi, psi)]
+
+    def log_likelihood_orientations(self, xs, theta, phi, psi=0., weights=None):
+        """
+        Returns the log likelihood of xs for the distribution re-oriented to every theta,
+        phi, psi (broadcast against each other), e.g. a likelihood map over source positions.
+        It uses the sufficient statistics of xs and a single normalization, so that the cost
+        per orientation does not depend on the number of values.
+
+        >>> k = fb8(0.3, 1.2, -0.4, 20., 5., -0.5, 0.7, 0.4)
+        >>> xs = k.rvs(100)
+        >>> thetas, phis = np.meshgrid(np.linspace(0, np.pi, 5), np.linspace(-np.pi, np.pi, 7))
+        >>> llhs = k.log_likelihood_orientations(xs, thetas, phis, 0.5)
+        >>> print(llhs.shape, np.isclose(llhs[3, 2], fb8(thetas[3, 2], phis[3, 2], 0.5,
+        ...                                              20., 5., -0.5, 0.7, 0.4).log_likelihood(xs)))
+        (7, 5) True
+        """
+        w, s, S = sufficient_statistics(np.reshape(xs, (-1, 3)), weights)
+        theta, phi, psi = np.broadcast_arrays(theta, phi, psi)
+        shape = theta.shape
+        Gammas = self.create_matrix_Gamma(theta.ravel(), phi.ravel(), psi.ravel())
+        gs = np.einsum('mij,i->mj', Gammas, s)
+        g2Sg2 = np.einsum('mi,ij,mj->m', Gammas[..., 1], S, Gammas[..., 1])
+        g3Sg3 = np.einsum('mi,ij,mj->m', Gammas[..., 2], S, Gammas[..., 2])
+        llh = (self.kappa * np.dot(gs, self.nu) + self.beta * (g2Sg2 - self.eta * g3Sg3) -
+               w * self.log_normalize())
+        return llh.reshape(shape)
 
     @property
     def Gamma(self):
@@ -451,26 +942,40 @@ class FB8Distribution(object):
     def Dnu_rho(self):
         return self.create_matrix_DH_phi(self.alpha, self.rho)[...,0]
 
+    @property
+    def D2nu(self):
+        """
+        Second derivatives of nu wrt alpha, rho as a nested 2x2 list
+        """
+        D2nu_alpha_rho = self.create_matrix_DH_theta_phi(self.alpha, self.rho)[...,0]
+        return [[self.create_matrix_DH_theta_theta(self.alpha, self.rho)[...,0], D2nu_alpha_rho],
+                [D2nu_alpha_rho, self.create_matrix_DH_phi_phi(self.alpha, self.rho)[...,0]]]
+
     def _nnormalize(self, epsabs=1e-3, epsrel=1e-3):
         """
         Perform numerical integration with dblquad. This function can be used for testing and 
         exception handling in self.normalize
         """
         # numerical integration
+        from scipy.integrate import dblquad
         k, b, m = self.kappa, self.beta, self.eta
         n1, n2, n3 = self.nu
-        return dblquad(
+        start = time.perf_counter()
+        retval = dblquad(
             lambda th, ph: np.sin(th)*\
             np.exp(k*(n1*np.cos(th)+n2*np.sin(th)*np.cos(ph)+n3*np.sin(th)*np.sin(ph))+\
                    b*np.sin(th)**2*(np.cos(ph)**2-m*np.sin(ph)**2)),
                    0., 2.*np.pi, lambda x: 0., lambda x: np.pi,
                    epsabs=epsabs, epsrel=epsrel)[0]
+        _observe('normalize.numerical.time', time.perf_counter() - start)
+        return retval
 
-    def normalize(self, cache=dict(), return_num_iterations=False):
+    def normalize(self, cache=dict(), return_num_iterations=False, tol=1E-12):
         """
         Returns the normalization constant of the FB8 distribution.
-        The proportional error may be expected not to be greater than
-        1E-11.
+        The series is truncated once the terms are below tol relative
+        to the sum. The proportional error may be expected not to be
+        greater than 1E-11 for the default tol.
 
 
         >>> gamma1 = np.array([1.0, 0.0, 0.0])
@@ -498,7 +1003,9 @@ class FB8Distribution(object):
             return (self.a_c8_star(jj, kk, ll, b, k, m, n1, n2, n3) *
                     H0F1(v+1, z**2/4) * H2F1(-jj, kk+0.5, 0.5-jj-ll, -m))
     
-        if (k, b, m, n1, n2) not in cache:
+        _count('normalize.cache', 'miss' if (k, b, m, n1, n2, tol) not in cache else 'hit')
+        if (k, b, m, n1, n2, tol) not in cache:
+            start = time.perf_counter()
             result = 0.
             if b == 0. and k == 0.:
                 result = 2
@@ -515,7 +1022,8 @@ class FB8Distribution(object):
                         a = a_c6(js, b, k, m)
                         evens = js % 2==0
                         if np.any(a[evens] < 0):
-                            logging.info('a < 0 for even j, masking. This is due to an inaccuracy in H2F1')
+                            _diagnose('normalize.h2f1_masked', logging.INFO, self,
+                                      'a < 0 for even j, masking. This is due to an inaccuracy in H2F1. %r', self)
                             # hack around H2F1 inaccuracy
                             a[(evens) & (a < 0)] = 0
                         sa = a.sum()
@@ -524,13 +1032,11 @@ class FB8Distribution(object):
                         # print j, sa
                         result += sa
                         if np.isnan(result):
-                            logging.warning('Series result is nan')
-                            raise RuntimeWarning
+                            raise RuntimeWarning('Series result is nan')
                         if np.isinf(result):
-                            logging.warning('Series result is infinity')
-                            raise RuntimeWarning
+                            raise RuntimeWarning('Series result is infinity')
                         j += 1
-                        if abs_sa < np.abs(result) * 1E-12 and abs_sa <= prev_abs_a:
+                        if abs_sa < np.abs(result) * tol and abs_sa <= prev_abs_a:
                             break
                         prev_abs_a = abs_sa
             # FB8
@@ -538,6 +1044,8 @@ class FB8Distribution(object):
                 try:
                     ll = 0
                     prev_abs_sa_ll = 0
+                    abs_result = 0.
+                    masked_result = 0.
                     _l, _k, _j = (14,)*3
                     _jjs, _kks, _lls = np.mgrid[0:_j,0:_k,0:_l]
                     while True:
@@ -553,8 +1061,10 @@ class FB8Distribution(object):
                                 a = a_c8(jjs, kk*_k+_kks, ll*_l+_lls, b, k, m, n1, n2, n3)
                                 evens = jjs%2==0
                                 if np.any(a[evens] < 0):
-                                    logging.info('a < 0 for even j, masking. This is due to an inaccuracy in H2F1.')
+                                    _diagnose('normalize.h2f1_masked', logging.INFO, self,
+                                              'a < 0 for even j, masking. This is due to an inaccuracy in H2F1. %r', self)
                                     # hack around H2F1 inaccuracy
+                                    masked_result -= a[(evens) & (a < 0)].sum()
                                     a[(evens) & (a < 0)] = 0
                                 sa = a.sum()
                                 abs_sa = np.abs(a).sum()
@@ -563,13 +1073,13 @@ class FB8Distribution(object):
                                 # print j, a, I(j+0.5, k)
                                 curr_abs_sa_kk += abs_sa
                                 curr_abs_sa_ll += abs_sa
+                                abs_result += abs_sa
                                 result += sa
                                 if np.isnan(result):
-                                    logging.warning('Series result is nan')
-                                    raise RuntimeWarning
+                                    raise RuntimeWarning('Series result is nan')
                                 j += 1
                                 jj += 1
-                                if abs_sa < np.abs(result) * 1E-12 and abs_sa <= prev_abs_sa_jj:
+                                if abs_sa < np.abs(result) * tol and abs_sa <= prev_abs_sa_jj:
                                     break
                                 prev_abs_sa_jj = abs_sa
                                 ### DEBUG ###
@@ -587,7 +1097,7 @@ class FB8Distribution(object):
                             # print ll, kk, curr_abs_sa_kk, result
                             # assert not curr_abs_sa_kk < 0
                             kk += 1
-                            if curr_abs_sa_kk < np.abs(result) * 1E-12 and curr_abs_sa_kk <= prev_abs_sa_kk:
+                            if curr_abs_sa_kk < np.abs(result) * tol and curr_abs_sa_kk <= prev_abs_sa_kk:
                                 break
                             prev_abs_sa_kk = curr_abs_sa_kk
 
@@ -595,28 +1105,47 @@ class FB8Distribution(object):
                         ### DEBUG ###
                         # print ll, curr_abs_sa_ll, result
                         ll += 1
-                        if curr_abs_sa_ll < np.abs(result) * 1E-12 and curr_abs_sa_ll <= prev_abs_sa_ll:
+                        if curr_abs_sa_ll < np.abs(result) * tol and curr_abs_sa_ll <= prev_abs_sa_ll:
                             # print(jj, kk, ll, j)
                             break
                         prev_abs_sa_ll = curr_abs_sa_ll
                     if not result > 0:
-                        logging.warning('Series result not positive')
-                        raise RuntimeWarning
-                except (RuntimeWarning, OverflowError) as e:
-                    logging.warning('Series calculation of normalization failed. Attempting numerical integration... '+self.__repr__())
-                    try:
-                        # numerical integration
-                        result = self._nnormalize()/(2*np.pi)
-                    except RuntimeWarning as e:
-                        result = np.inf
+                        raise RuntimeWarning('Series result not positive')
+                    # for large kappa*nu2 or kappa*nu3 the terms cancel beyond the floating
+                    # point precision or the masked H2F1 inaccuracies dominate the result
+                    if abs_result / 1E10 > result or masked_result > result * 1E-6:
+                        raise RuntimeWarning('Series result not accurate')
+                except (RuntimeWarning, OverflowError, FloatingPointError) as e:
+                    reason = str(e) or type(e).__name__
+                    _count('normalize.series_failure', reason)
+                    lnormalize, curvature = self._laplace_log_normalize()
+                    if curvature >= self.minimum_laplace_curvature:
+                        _diagnose('normalize.fallback', logging.WARNING, self,
+                                  'Series calculation of normalization failed (%s). Using asymptotic expansion... %r',
+                                  reason, self)
+                        _count('normalize.fallback', 'laplace')
+                        result = np.exp(lnormalize)/(2*np.pi)
+                    else:
+                        _diagnose('normalize.fallback', logging.WARNING, self,
+                                  'Series calculation of normalization failed (%s). Attempting numerical integration... %r',
+                                  reason, self)
+                        _count('normalize.fallback', 'numerical')
+                        try:
+                            # numerical integration
+                            result = self._nnormalize()/(2*np.pi)
+                        except (RuntimeWarning, FloatingPointError) as e:
+                            result = np.inf
                     j = -1
 
-            cache[k, b, m, n1, n2] = 2 * np.pi * result
+            if j >= 0:
+                _observe('normalize.series.time', time.perf_counter() - start)
+                _observe('normalize.series.blocks', j)
+            cache[k, b, m, n1, n2, tol] = 2 * np.pi * result
 
         if return_num_iterations:
-            return cache[k, b, m, n1, n2], j
+            return cache[k, b, m, n1, n2, tol], j
         else:
-            return cache[k, b, m, n1, n2]
+            return cache[k, b, m, n1, n2, tol]
 
     def _approx_log_normalize(self):
         """
@@ -629,8 +1158,9 @@ class FB8Distribution(object):
         ...    if np.abs(lnorm-lnormapprox)/lnorm > 0.1:
         ...        print(fb8(*x), lnorm, lnormapprox)
         """
-        # should only reach here if FB6 or BM4-with-eta
-        assert self.nu[0] == 1 or self.kappa == 0
+        # FB8 is approximated by the expansion around its modes
+        if not (self.nu[0] == 1 or self.kappa == 0):
+            return self._laplace_log_normalize()[0]
         k = self.kappa
         b = self.beta
         m = self.eta
@@ -649,9 +1179,70 @@ class FB8Distribution(object):
 
         return lnormalize
         
+    def _laplace_log_normalize(self, cache=dict()):
+        """
+        Returns the asymptotic expansion of log(c) for large concentration and the smallest
+        curvature of -log(pdf) at the modes, which is 0 if a mode is degenerate (e.g. the
+        small circle for eta=-1). The expansion is only meaningful for a large curvature.
+
+        Around a mode x0 with tangent basis e1, e2 the integral is taken in the projection
+        x = sqrt(1-|u|**2) x0 + u1 e1 + u2 e2 with area element du/sqrt(1-|u|**2). With
+        f = c.x + x^T D x, c = kappa*nu and D = diag(0, beta, -beta*eta)
+
+          f = f0 - u^T H u/2 + (a.u) |u|**2/2 - (c.x0) |u|**4/8 + O(|u|**5)
+
+        where H = lam - 2 e^T D e, a = e^T c and lam = c.x0 + 2 x0^T D x0 the Lagrange
+        multiplier, so that with the Gaussian moments of Sigma = H^-1
+
+          c = sum_modes 2 pi exp(f0)/sqrt(det H) (1 + <f4> + <f3**2>/2 + tr(Sigma)/2 + ...)
+
+        >>> k = fb8(0., 0., 0., 400., 30., 0.3, 0.5, 0.5)
+        >>> lnormalize, curvature = k._laplace_log_normalize()
+        >>> print(np.abs(lnormalize - k.log_normalize()) < 1E-6, curvature > 100)
+        True True
+        """
+        k, b, m = self.kappa, self.beta, self.eta
+        n1, n2, n3 = self.nu
+        if (k, b, m, n1, n2, n3) not in cache:
+            start = time.perf_counter()
+            xs, fs = self._local_modes()
+            c = k * self.nu
+            d = np.array([0., b, -b*m])
+            terms = []
+            curvature = np.inf
+            for x0, f0 in zip(xs, fs):
+                if not np.isfinite(f0):
+                    continue
+                e1 = np.cross(x0, np.eye(3)[np.argmin(np.abs(x0))])
+                e1 /= norm(e1)
+                e = np.array([e1, np.cross(x0, e1)]).T
+                H = (np.dot(c, x0) + 2*np.dot(d, x0**2))*np.eye(2) - 2*np.dot(e.T*d, e)
+                curvature = min(curvature, np.linalg.eigvalsh(H)[0])
+                if not curvature > 0:
+                    break
+                Sigma = np.linalg.inv(H)
+                a = np.dot(e.T, c)
+                tr, tr2 = np.trace(Sigma), np.trace(np.dot(Sigma, Sigma))
+                v = np.dot(Sigma, a)
+                # <|u|**4>, <(a.u)**2 |u|**4> by Isserlis' theorem
+                u4 = tr**2 + 2*tr2
+                au2u4 = np.dot(a, v)*u4 + 4*np.dot(v, v)*tr + 8*np.dot(v, np.dot(Sigma, v))
+                correction = -np.dot(c, x0)/8*u4 + au2u4/8 + tr/2
+                terms.append(f0 + np.log(2*np.pi) - np.log(np.linalg.det(H))/2 +
+                             np.log1p(max(correction, -0.5)))
+            if curvature > 0 and terms:
+                lnormalize = np.logaddexp.reduce(terms)
+            else:
+                lnormalize, curvature = np.nan, 0.
+            cache[k, b, m, n1, n2, n3] = lnormalize, curvature
+            _observe('normalize.laplace.time', time.perf_counter() - start)
+        return cache[k, b, m, n1, n2, n3]
+
     def log_normalize(self):
         """
-        Returns the logarithm of the normalization constant.
+        Returns the logarithm of the normalization constant. For large concentrations
+        (see laplace_curvature) the asymptotic expansion _laplace_log_normalize() is used
+        instead of the series.
 
 
         >>> from itertools import product
@@ -663,16 +1254,38 @@ class FB8Distribution(object):
         ...    lnnorm = np.log(fb8(*x)._nnormalize())
         ...    if np.abs(lnorm-lnnorm)/lnorm > 0.1:
         ...        print(fb8(*x), lnorm, lnnorm)
-        fb8(0.00, 0.00, 0.00, 256.00, 128.00, 1.00, 1.57, 1.05) 337.92901512585655 289.8261422778405
-        fb8(0.00, 0.00, 0.00, 256.00, 256.00, 1.00, 1.57, 1.05) 466.232162006902 400.40834745629957
         """
-        with warnings.catch_warnings():
-            warnings.simplefilter('error')
+        if self._precomputed is not None and 'log_normalize' in self._precomputed:
+            return self._precomputed['log_normalize']
+        if _normalization_backend is not None and _normalization_backend.active:
+            start = time.perf_counter()
+            value = _normalization_backend.get(self, False)
+            _observe('log_normalize.backend.time', time.perf_counter() - start)
+            if value is not None:
+                return value[0]
+        return self._log_normalize()
+
+    def _log_normalize(self):
+        # the curvature at the modes is below kappa + 4*beta
+        if (not (self.nu[0] == 1 or self.kappa == 0) and
+                self.kappa + 4*self.beta >= self.laplace_curvature):
+            lnormalize, curvature = self._laplace_log_normalize()
+            if curvature >= self.laplace_curvature:
+                return lnormalize
+        # np.errstate, unlike warnings.catch_warnings, is thread-safe
+        with np.errstate(over='raise', divide='raise', invalid='raise'):
             try:
                 return np.log(self.normalize())
-            except (OverflowError, RuntimeWarning) as e:
-                logging.warning('Series calculation of normalization failed. Approximating normalization... '+self.__repr__())
-                return self._approx_log_normalize()
+            except (OverflowError, RuntimeWarning, FloatingPointError) as e:
+                reason = str(e) or type(e).__name__
+                _diagnose('log_normalize.fallback', logging.WARNING, self,
+                          'Series calculation of normalization failed (%s). Approximating normalization... %r',
+                          reason, self)
+                _count('log_normalize.series_failure', reason)
+                start = time.perf_counter()
+                lnormalize = self._approx_log_normalize()
+                _observe('log_normalize.approximation.time', time.perf_counter() - start)
+                return lnormalize
 
     def _grad_log_normalize(self, cache=dict(), return_num_iterations=False):
         """ Derivative of the log-normalization constant wrt k, b, m, alpha, rho
@@ -691,6 +1304,19 @@ class FB8Distribution(object):
         ...     if check_grad(func, grad, x) > 1:
         ...         print(fb8(0,0,0,*x), check_grad(func, grad, x))
         """
+        if (self._precomputed is not None and 'grad_log_normalize' in self._precomputed and
+                not return_num_iterations):
+            return list(self._precomputed['grad_log_normalize'])
+        if (_normalization_backend is not None and _normalization_backend.active and
+                not return_num_iterations):
+            start = time.perf_counter()
+            value = _normalization_backend.get(self, True)
+            _observe('log_normalize.backend.time', time.perf_counter() - start)
+            if value is not None:
+                return list(value[1])
+        return self._series_grad_log_normalize(cache, return_num_iterations)
+
+    def _series_grad_log_normalize(self, cache=dict(), return_num_iterations=False):
         k, b, m = self.kappa, self.beta, self.eta
         n1, n2, n3 = self.nu
         alpha, rho = self.alpha, self.rho
@@ -748,6 +1374,7 @@ class FB8Distribution(object):
 
         if (k, b, m, n1, n2) not in cache:
             snorm = 2*np.pi/np.exp(self.log_normalize())
+            start = time.perf_counter()
             j = 0
             result = np.zeros([5,])
             # FB6
@@ -761,8 +1388,10 @@ class FB8Distribution(object):
                     abs_sa = np.abs(grad_a).sum(axis=1)*snorm
                     result[:3] += sa
                     if np.any(np.isnan(result)) or np.any(np.isinf(result)):
-                        logging.warning(
-                            'Series grad(ln(c6)) is nan or infinity, using approx_fprime...'+self.__repr__())
+                        from scipy.optimize import approx_fprime
+                        _diagnose('grad_log_normalize.fallback', logging.WARNING, self,
+                                  'Series grad(ln(c6)) is nan or infinity, using approx_fprime... %r', self)
+                        _count('grad_log_normalize.fallback', 'approx_fprime')
                         result[:3] = approx_fprime((k,b,m), lambda x: fb8(0,0,0,*x).log_normalize(),
                                                    1.49e-8)
                         j = -1
@@ -797,8 +1426,10 @@ class FB8Distribution(object):
                             # print j, a, I(j+0.5, k)
                             # print(j,ll,kk,jj, result*2*np.pi/norm)
                             if np.any(np.isnan(sa)):
-                                logging.warning(
-                                    'Series grad(ln(c_8)) is nan, using approx_fprime...'+self.__repr__())
+                                from scipy.optimize import approx_fprime
+                                _diagnose('grad_log_normalize.fallback', logging.WARNING, self,
+                                          'Series grad(ln(c_8)) is nan, using approx_fprime... %r', self)
+                                _count('grad_log_normalize.fallback', 'approx_fprime')
                                 result = approx_fprime((k,b,m,alpha,rho), lambda x: fb8(0,0,0,*x).log_normalize(),
                                                        1.49e-8)
                                 j = -1
@@ -823,6 +1454,9 @@ class FB8Distribution(object):
                         break
                     prev_abs_sa_ll = curr_abs_sa_ll
 
+            if j >= 0:
+                _observe('grad_log_normalize.series.time', time.perf_counter() - start)
+                _observe('grad_log_normalize.series.blocks', j)
             cache[k, b, m, n1, n2] = result
 
         if return_num_iterations:
@@ -830,53 +1464,198 @@ class FB8Distribution(object):
         else:
             return cache[k, b, m, n1, n2]
 
-    def max(self):
+    def _log_normalize_derivatives(self, cache=dict()):
+        """
+        Returns the gradient (6,) and the Hessian (6, 6) of the log-normalization constant
+        wrt k, b, m, n1, n2, n3 where nu = (n1, n2, n3) is treated as unconstrained. The
+        series of normalize() is differentiated twice term by term with
+          d/dz 0F1(v+1, z) = 0F1(v+2, z)/(v+1)
+          d/dm 2F1(a, b, c, -m) = -a*b/c 2F1(a+1, b+1, c+1, -m)
+        If the series fails, central differences of log_normalize() are used instead.
+        """
         k, b, m = self.kappa, self.beta, self.eta
         n1, n2, n3 = self.nu
-        if n1 == 1.:
-            if self.beta == 0.0:
-                x1 = 1
-            else:
-                x1 = self.kappa / (2 * self.beta)
-            if x1 > 1:
-                x1 = 1
-            x2 = np.sqrt(1 - x1**2)
-            x3 = 0
-        else:
-            # FB8
-            # Line search along solution set with BFGS run over x_max
-            ntests = 1001
-            radicalz = lambda z: 4*m**2*z**2*(z**2-1)*b**2+\
-              4*m*z*(z**2-1)*b*k*n1+k**2*((z**2-1)*n1**2+z**2*n3**2)
-
-            curr_max = -np.inf
-            x_max = None
-            for sgn_0 in [-1,1]:
-                for sgn_1 in [-1,1]:
-                    x1 = np.linspace(-1,1,ntests)
-                    x2 = sgn_0*np.sqrt(-radicalz(x1))/(2*m*x1*b+k*n1)
-                    x3 = sgn_1*np.sqrt(1-x1**2-x2**2)
-
-                    x = np.asarray((x1, x2, x3))
-                    lpdfs = self.log_pdf(np.dot(self.Gamma, x).T, normalize=False)
-                    lpdfs_max = np.nanmax(lpdfs)
-                    # print lpdfs_max
-                    if lpdfs_max > curr_max:
-                        x_max = x.T[np.nanargmax(lpdfs)]
-                        curr_max = lpdfs_max
-
-            f = lambda x: -k*(
-                n1*np.cos(x[0])+n2*np.sin(x[0])*np.cos(x[1])+n3*np.sin(x[0])*np.sin(x[1])) -\
-                b*np.sin(x[0])**2*(np.cos(x[1])**2-m*np.sin(x[1])**2)
-            _x = minimize(f, self.gamma1_to_spherical_coordinates(x_max))
-            if not _x.success:
-                warning_message = _x.message
-                warnings.warn(warning_message, RuntimeWarning)
-            x1,x2,x3= self.spherical_coordinates_to_nu(*_x.x)
-
-        x = np.dot(self.Gamma, np.asarray((x1, x2, x3)))
+        eps = 1e-6
+        if k == 0.:
+            k = eps
+        if b == 0.:
+            b = eps
+        if m == -1.:
+            m = -1+eps
+        elif m == 1.:
+            m = 1-eps
+        if n2 == 0.:
+            n2 = eps
+        if n3 == 0.:
+            n3 = eps
+
+        def hess_a_c8(jj, kk, ll, b, k, m, n1, n2, n3):
+            v = jj + ll + kk + 0.5
+            u = (k*n1)**2/4
+            a_c8_st = self.a_c8_star(jj, kk, ll, b, k, m, n1, n2, n3)
+            # 0F1 and its first two derivatives wrt u
+            f0 = H0F1(v+1, u)
+            f1 = H0F1(v+2, u)/(v+1)
+            f2 = H0F1(v+3, u)/((v+1)*(v+2))
+            # 2F1 and its first two derivatives wrt m
+            c = 0.5-jj-ll
+            g0 = H2F1(-jj, kk+0.5, c, -m)
+            g1 = jj*(kk+0.5)/c * H2F1(1-jj, kk+1.5, c+1, -m)
+            g2 = jj*(jj-1)*(kk+0.5)*(kk+1.5)/(c*(c+1)) * H2F1(2-jj, kk+2.5, c+2, -m)
+            zs = np.zeros(v.shape)
+            # derivatives of the log of the prefactor a_c8_st and of u wrt k, b, m, n1, n2, n3
+            dl = np.array([2*(kk+ll)/k, jj/b, zs, zs, 2*ll/n2, 2*kk/n3]).reshape(6, -1)
+            d2l = np.array([-2*(kk+ll)/k**2, -jj/b**2, zs, zs,
+                            -2*ll/n2**2, -2*kk/n3**2]).reshape(6, -1)
+            du = np.array([k*n1**2/2, 0, 0, k**2*n1/2, 0, 0])
+            d2u = np.zeros((6, 6))
+            d2u[0, 0], d2u[0, 3], d2u[3, 0], d2u[3, 3] = n1**2/2, k*n1, k*n1, k**2/2
+            dm = np.array([0., 0., 1., 0., 0., 0.])
+            # w_ij: terms with the i-th derivative of 0F1 and the j-th derivative of 2F1
+            w00, w10, w01 = [(a_c8_st * _).ravel() for _ in (f0 * g0, f1 * g0, f0 * g1)]
+            w20, w11, w02 = [np.sum(a_c8_st * _) for _ in (f2 * g0, f1 * g1, f0 * g2)]
+            grad = np.dot(dl, w00) + du * w10.sum() + dm * w01.sum()
+            hess = np.dot(dl * w00, dl.T) + np.diag(np.dot(d2l, w00))
+            hess += np.outer(du, du) * w20 + d2u * w10.sum() + np.outer(dm, dm) * w02
+            for _ in (np.outer(np.dot(dl, w10), du), np.outer(np.dot(dl, w01), dm),
+                      np.outer(du, dm) * w11):
+                hess += _ + _.T
+            return w00.sum(), grad, hess
+
+        if (k, b, m, n1, n2, n3) not in cache:
+            try:
+                snorm = 2*np.pi/np.exp(self.log_normalize())
+                a_sum, grad, hess = 0., np.zeros(6), np.zeros((6, 6))
+                ll = 0
+                prev_abs_sa_ll = 0
+                _l, _k, _j = (14,)*3
+                _jjs, _kks, _lls = np.mgrid[0:_j,0:_k,0:_l]
+                with np.errstate(all='ignore'):
+                    while True:
+                        curr_abs_sa_ll = 0
+                        kk = 0
+                        prev_abs_sa_kk = 0
+                        while True:
+                            curr_abs_sa_kk = 0
+                            jj = 0
+                            prev_abs_sa_jj = 0
+                            while True:
+                                sa, sgrad, shess = hess_a_c8(jj*_j+_jjs, kk*_k+_kks, ll*_l+_lls,
+                                                             b, k, m, n1, n2, n3)
+                                sa, sgrad, shess = sa*snorm, sgrad*snorm, shess*snorm
+                                abs_sa = np.abs(sa) + np.abs(sgrad).sum() + np.abs(shess).sum()
+                                if not np.isfinite(abs_sa):
+                                    raise RuntimeWarning
+                                a_sum += sa
+                                grad += sgrad
+                                hess += shess
+                                curr_abs_sa_kk += abs_sa
+                                curr_abs_sa_ll += abs_sa
+                                scale = np.abs(a_sum) + np.abs(grad).sum() + np.abs(hess).sum()
+                                jj += 1
+                                if abs_sa <= scale * 1E-10 and abs_sa <= prev_abs_sa_jj:
+                                    break
+                                prev_abs_sa_jj = abs_sa
+                            kk += 1
+                            if curr_abs_sa_kk <= scale * 1E-10 and curr_abs_sa_kk <= prev_abs_sa_kk:
+                                break
+                            prev_abs_sa_kk = curr_abs_sa_kk
+                        ll += 1
+                        if curr_abs_sa_ll <= scale * 1E-10 and curr_abs_sa_ll <= prev_abs_sa_ll:
+                            break
+                        prev_abs_sa_ll = curr_abs_sa_ll
+                if not a_sum > 0:
+                    raise RuntimeWarning
+                grad = grad / a_sum
+                hess = hess / a_sum - np.outer(grad, grad)
+            except RuntimeWarning:
+                _diagnose('log_normalize_derivatives.fallback', logging.WARNING, self,
+                          'Series hess(ln(c_8)) failed, using finite differences... %r', self)
+                grad, hess = self._log_normalize_derivatives_fd(np.array([k, b, m, n1, n2, n3]))
+            cache[k, b, m, n1, n2, n3] = grad, hess
+
+        return cache[k, b, m, n1, n2, n3]
+
+    @staticmethod
+    def _log_normalize_derivatives_fd(x, rel_step=1e-3):
+        """
+        Central difference gradient and Hessian of the log-normalization constant at
+        x = (k, b, m, n1, n2, n3). The normalization only depends on k*nu, which is used to
+        evaluate it for nu off the unit sphere.
+        """
+        def func(x):
+            z = x[0] * x[3:]
+            kappa = norm(z)
+            return fb84(np.eye(3), kappa, x[1], x[2], z/kappa).log_normalize()
+
+        h = rel_step * np.maximum(np.abs(x), 1.)
+        # keep -1 <= m <= 1
+        h[2] = min(h[2], (1 - np.abs(x[2])) / 2)
+        f0 = func(x)
+        grad = np.empty(6)
+        hess = np.empty((6, 6))
+        es = np.diag(h)
+        for i in range(6):
+            fp, fm = func(x + es[i]), func(x - es[i])
+            grad[i] = (fp - fm) / (2 * h[i])
+            hess[i, i] = (fp - 2 * f0 + fm) / h[i]**2
+            for j in range(i):
+                hess[i, j] = hess[j, i] = (
+                    func(x + es[i] + es[j]) - func(x + es[i] - es[j]) -
+                    func(x - es[i] + es[j]) + func(x - es[i] - es[j])) / (4 * h[i] * h[j])
+        return grad, hess
+
+    def _hess_log_normalize(self):
+        """ Hessian of the log-normalization constant wrt k, b, m, alpha, rho
+
+
+        >>> def grad(x):
+        ...     return fb8(0,0,0,*x)._grad_log_normalize()
+        >>> def hess(x):
+        ...     return fb8(0,0,0,*x)._hess_log_normalize()
+        >>> from scipy.optimize import approx_fprime
+        >>> from itertools import product
+        >>> for x in product([0.5, 16, 32], [0.5, 16], [-0.9, 0.5],
+        ...                  [0.3, 2.0], [0.5]):
+        ...     num = np.array([approx_fprime(x, lambda x: grad(x)[i], 1e-6) for i in range(5)])
+        ...     if np.abs(num - hess(x)).max() > 1e-2 * max(1, np.abs(num).max()):
+        ...         print(fb8(0,0,0,*x), np.abs(num - hess(x)).max())
+        """
+        g6, h6 = self._log_normalize_derivatives()
+        jac_nu = np.array([self.Dnu_alpha, self.Dnu_rho]).T
+        D2nu = self.D2nu
+        hess = np.empty((5, 5))
+        hess[:3, :3] = h6[:3, :3]
+        hess[:3, 3:] = np.dot(h6[:3, 3:], jac_nu)
+        hess[3:, :3] = hess[:3, 3:].T
+        hess[3:, 3:] = np.dot(jac_nu.T, np.dot(h6[3:, 3:], jac_nu))
+        for i in range(2):
+            for j in range(2):
+                hess[3+i, 3+j] += np.dot(g6[3:], D2nu[i][j])
+        return hess
+
+    def _local_modes(self):
+        if self._modes is None:
+            self._modes = fb8_modes(self.kappa, self.beta, self.eta, self.nu)
+        return self._modes
+
+    def modes(self):
+        """
+        Returns the spherical coordinates (theta, phi) of all local maxima of the pdf,
+        ordered by decreasing pdf. The first entry is the global maximum, see max().
+        """
+        xs, fs = self._local_modes()
+        x = np.dot(self.Gamma, xs[np.isfinite(fs)].T).T
         return FB8Distribution.gamma1_to_spherical_coordinates(x)
 
+    def max(self):
+        """
+        Returns the spherical coordinates (theta, phi) of the global maximum of the pdf.
+        The modes are solved for once and cached, see fb8_modes().
+        """
+        theta, phi = self.modes()
+        return theta[0], phi[0]
+
     def pdf_max(self, normalize=True):
         return np.exp(self.log_pdf_max(normalize))
 
@@ -884,8 +1663,11 @@ class FB8Distribution(object):
         """
         Returns the maximum value of the log(pdf)
         """
-        return self.log_pdf(FB8Distribution.spherical_coordinates_to_nu(
-            *self.max()),normalize)
+        lfmax = self._local_modes()[1][0]
+        if normalize:
+            return lfmax - self.log_normalize()
+        else:
+            return lfmax
 
     def pdf(self, xs, normalize=True):
         """
@@ -924,14 +1706,21 @@ class FB8Distribution(object):
         else:
             return f
 
+    def _stacked_Gammas(self):
+        """
+        Returns Gamma^T, DGamma_theta^T, DGamma_phi^T and DGamma_psi^T stacked to (12, 3),
+        so that a single product with xs^T projects on all of them.
+        """
+        return np.concatenate([self.Gamma.T, self.DGamma_theta.T,
+                               self.DGamma_phi.T, self.DGamma_psi.T])
+
     def _grad_log_pdf(self, xs):
         """
-        Returns the gradient of the log(pdf(xs)) over the parameters.
+        Returns the gradient of the log(pdf(xs)) over the parameters for every value of xs.
+        See _grad_log_likelihood() for the sum over xs without the arrays per value.
         """
-        gx = MMul(self.Gamma.T, np.asarray(xs).T)
-        dgx_theta = MMul(self.DGamma_theta.T, np.asarray(xs).T)
-        dgx_phi = MMul(self.DGamma_phi.T, np.asarray(xs).T)
-        dgx_psi = MMul(self.DGamma_psi.T, np.asarray(xs).T)
+        gx, dgx_theta, dgx_phi, dgx_psi = np.split(
+            MMul(self._stacked_Gammas(), np.asarray(xs).T), 4)
         k, b, m = self.kappa, self.beta, self.eta
         ngx = self.nu.dot(gx)
 
@@ -948,16 +1737,40 @@ class FB8Distribution(object):
         # print(Df_b, _[1])
         return Df_theta, Df_phi, Df_psi, Df_k-_[0], Df_b-_[1], Df_m-_[2], Df_alpha-_[3], Df_rho-_[4]
 
-    def log_likelihood(self, xs):
+    def log_likelihood(self, xs, weights=None):
         """
-        Returns the log likelihood for xs.
+        Returns the log likelihood for xs. If given, the log_pdf of each value is
+        multiplied by its weight, e.g. a count or an importance weight.
         """
         retval = self.log_pdf(xs)
+        if weights is not None:
+            return np.dot(weights, retval)
         return sum(retval, len(np.shape(retval)) - 1)
 
-    def grad_log_likelihood(self, xs):
+    def _grad_log_likelihood(self, xs, weights=None, chunksize=None):
         """
-        Returns the gradient of the log likelihood given xs over all 8 parameters.
+        Returns the gradient (8,) of the log likelihood for xs, optionally weighted.
+
+        The sufficient statistics of xs are summed in blocks of chunksize values (all at
+        once by default), see sufficient_statistics() and fb8_grad_log_likelihood().
+        """
+        xs = np.reshape(xs, (-1, 3))
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)
+        if chunksize is None:
+            chunksize = max(len(xs), 1)
+        w, s, S = 0., np.zeros(3), np.zeros((3, 3))
+        for i in range(0, len(xs), chunksize):
+            _w, _s, _S = sufficient_statistics(
+                xs[i:i + chunksize], None if weights is None else weights[i:i + chunksize])
+            w, s, S = w + _w, s + _s, S + _S
+        return _fb8_kernel(self.parameters, (w, s, S), True, shape=self)
+
+    def grad_log_likelihood(self, xs, weights=None, chunksize=None):
+        """
+        Returns the gradient of the log likelihood given xs (and optionally weights, see
+        log_likelihood()) over all 8 parameters. Large xs can be processed in blocks of
+        chunksize values to bound the memory.
 
         >>> def func_llh(x, xs):
         ...     return fb8(*x).log_likelihood(xs)
@@ -975,12 +1788,98 @@ class FB8Distribution(object):
         ...     if check_grad(func_llh, grad_llh, x, xs) > 1:
         ...         print(x, check_grad(func_llh, grad_llh, x, xs))
         """
-        gradval = self._grad_log_pdf(xs)
-        return [sum(_, len(np.shape(_)) - 1) for _ in gradval]
+        return list(self._grad_log_likelihood(xs, weights, chunksize))
+
+    def _hess_log_likelihood_stats(self, w, s, S):
+        """
+        Returns the Hessian (8, 8) of the log likelihood over all 8 parameters given the
+        sufficient statistics w = sum_i 1, s = sum_i x_i and S = sum_i x_i x_i^T.
+        """
+        k, b, m = self.kappa, self.beta, self.eta
+        nu = self.nu
+        Gamma = self.Gamma
+        DGamma = [self.DGamma_theta, self.DGamma_phi, self.DGamma_psi]
+        D2Gamma = self.create_matrix_D2Gamma(self.theta, self.phi, self.psi)
+        Dnu = [self.Dnu_alpha, self.Dnu_rho]
+        D2nu = self.D2nu
+        Q = np.diag([0., 1., -m])
+        DQ_m = np.diag([0., 0., -1.])
+
+        # f = k * nu.(Gamma^T x) + b * (Gamma^T x)^T Q (Gamma^T x), summed over xs
+        def lin(A, n=nu):
+            return np.dot(n, np.dot(A.T, s))
+
+        def quad(A, B, Q=Q):
+            return np.trace(np.dot(Q, np.dot(A.T, np.dot(S, B))))
+
+        hess = np.zeros((8, 8))
+        for i in range(3):
+            for j in range(i, 3):
+                hess[i, j] = k * lin(D2Gamma[i][j]) + 2 * b * (
+                    quad(D2Gamma[i][j], Gamma) + quad(DGamma[i], DGamma[j]))
+            hess[i, 3] = lin(DGamma[i])
+            hess[i, 4] = 2 * quad(DGamma[i], Gamma)
+            hess[i, 5] = 2 * b * quad(DGamma[i], Gamma, DQ_m)
+            hess[i, 6] = k * lin(DGamma[i], Dnu[0])
+            hess[i, 7] = k * lin(DGamma[i], Dnu[1])
+        hess[3, 6] = lin(Gamma, Dnu[0])
+        hess[3, 7] = lin(Gamma, Dnu[1])
+        hess[4, 5] = quad(Gamma, Gamma, DQ_m)
+        hess[6, 6] = k * lin(Gamma, D2nu[0][0])
+        hess[6, 7] = k * lin(Gamma, D2nu[0][1])
+        hess[7, 7] = k * lin(Gamma, D2nu[1][1])
+        hess = np.triu(hess) + np.triu(hess, 1).T
+        hess[3:, 3:] -= w * self._hess_log_normalize()
+        return hess
+
+    def hessian_log_likelihood(self, xs):
+        """
+        Returns the Hessian (8, 8) of the log likelihood given xs over all 8 parameters
+        theta, phi, psi, kappa, beta, eta, alpha, rho.
+
+        >>> xs = np.array([[ 0.72692034, -0.58196172,  0.36456465],
+        ...                [ 0.58726806,  0.25163898, -0.76928152],
+        ...                [ 0.35595372,  0.77330355,  0.52468902]])
+        >>> from scipy.optimize import approx_fprime
+        >>> for x in [(0.3, -1, 1, 2, 0.5, 0.5, 0.5, 0.3), (1.2, 0.4, -0.5, 16, 8, -0.6, 2.0, -1.0),
+        ...           (0.5, 2.0, 0.1, 32, 2, 0.99, 1.0, 0.8), (2.0, -2.0, 0.7, 8, 32, -0.3, 0.2, 2.5)]:
+        ...     def grad(y, i):
+        ...         return fb8(*y).grad_log_likelihood(xs)[i]
+        ...     num = np.array([approx_fprime(np.array(x), grad, 1e-6, i) for i in range(8)])
+        ...     hess = fb8(*x).hessian_log_likelihood(xs)
+        ...     if np.abs(num - hess).max() > 1e-2 * max(1, np.abs(hess).max()):
+        ...         print(fb8(*x), np.abs(num - hess).max())
+        """
+        return self._hess_log_likelihood_stats(*sufficient_statistics(np.reshape(xs, (-1, 3))))
+
+    def fisher_information(self):
+        """
+        Returns the expected Fisher information (8, 8) of a single value over all 8
+        parameters theta, phi, psi, kappa, beta, eta, alpha, rho. The first and second
+        moments of x follow from the derivatives of the log-normalization constant wrt
+        k*nu, since E[Gamma^T x] = d log(c)/d(k nu) and
+        Cov[Gamma^T x] = d^2 log(c)/d(k nu)^2.
+
+        >>> from numpy.random import seed
+        >>> seed(2)
+        >>> k = fb8(0.5, 1.0, 0.3, 20., 6., -0.5, 0.7, 0.4)
+        >>> fisher = k.fisher_information()
+        >>> observed = -k.hessian_log_likelihood(k.rvs(100000)) / 100000
+        >>> print(np.abs(fisher - observed).max() < 0.02 * np.abs(fisher).max())
+        True
+        """
+        g6, h6 = self._log_normalize_derivatives()
+        # the same substitution as in _log_normalize_derivatives
+        k = self.kappa if self.kappa > 0 else 1e-6
+        mean = g6[3:] / k
+        second = h6[3:, 3:] / k**2 + np.outer(mean, mean)
+        Gamma = self.Gamma
+        return -self._hess_log_likelihood_stats(
+            1., np.dot(Gamma, mean), np.dot(Gamma, np.dot(second, Gamma.T)))
 
     def _rvs_helper(self):
         num_samples = 10000
-        xs = gauss(0, 1).rvs((num_samples, 3))
+        xs = np.random.standard_normal((num_samples, 3))
         xs = np.divide(xs, np.reshape(norm(xs, 1), (num_samples, 1)))
         lpvalues = self.log_pdf(xs, normalize=False)
         lfmax = self.log_pdf_max(normalize=False)
@@ -989,7 +1888,10 @@ class FB8Distribution(object):
         # assert lfmax > lpvalues.max()
         ## END
         shifted = lpvalues - lfmax
-        return xs[uniform(0, 1).rvs(num_samples) < np.exp(shifted)]
+        accepted = xs[np.random.uniform(0, 1, num_samples) < np.exp(shifted)]
+        _count('rvs.samples', 'accepted', len(accepted))
+        _count('rvs.samples', 'rejected', num_samples - len(accepted))
+        return accepted
 
     def rvs(self, n_samples=None):
         """
@@ -1015,8 +1917,11 @@ class FB8Distribution(object):
 
     def level(self, percentile=50, n_samples=10000):
         """
-        Returns the -log_pdf level at percentile by generating a set of rvs and their log_pdfs
+        Returns the -log_pdf level at percentile by generating a set of rvs and their log_pdfs.
+        Levels stored with the distribution, see catalog.py, are returned as they are.
         """
+        if self._precomputed is not None and percentile in self._precomputed.get('levels', ()):
+            return self._precomputed['levels'][percentile]
         if 0 <= percentile < 100:
             curr_len = self._level_log_pdf.size
             if curr_len < n_samples:
@@ -1082,16 +1987,84 @@ class FB8Distribution(object):
             x = rvs[np.argsort(np.abs(lev+self.log_pdf(rvs)))[:200]]
         return FB8Distribution.gamma1_to_spherical_coordinates(x)
 
+    def contours(self, percentiles=(50, 90, 99), npts=201, radius=None):
+        """
+        Returns ordered, closed contours for several percentiles at once.
+
+        The level sets are traced with marching squares on a grid in the tangent plane
+        around the mode (azimuthal equidistant projection). The log_pdf on the grid is
+        evaluated once and shared by all percentiles. If radius is None, the grid is
+        made just large enough to enclose the outermost contour.
+
+        Output is a list with an entry for each percentile, which itself is a list of
+        closed polylines (theta, phi). The first point of each polyline is repeated at the end.
+
+        >>> from numpy.random import seed
+        >>> seed(1)
+        >>> k = fb8(1.0, 1.0, 0.5, 100., 20.)
+        >>> c50, c90 = k.contours([50, 90])
+        >>> len(c50), len(c90)
+        (1, 1)
+        >>> theta, phi = c50[0]
+        >>> print(theta[0] == theta[-1] and phi[0] == phi[-1])
+        True
+        >>> xs = FB8Distribution.spherical_coordinates_to_nu(theta, phi)
+        >>> print(np.all(np.abs(-k.log_pdf(xs) - k.level(50)) < 1e-2))
+        True
+        """
+        x0 = FB8Distribution.spherical_coordinates_to_nu(*self.max())
+        e1 = np.cross(x0, np.eye(3)[np.argmin(np.abs(x0))])
+        e1 /= norm(e1)
+        e2 = np.cross(x0, e1)
+
+        def to_sphere(u, v):
+            r = np.hypot(u, v)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                sinc = np.where(r > 0, np.sin(r) / r, 1.)
+            return (np.cos(r)[..., None] * x0 +
+                    (sinc * u)[..., None] * e1 + (sinc * v)[..., None] * e2)
+
+        log_levels = -np.asarray([self.level(p) for p in percentiles])
+        if radius is None:
+            # largest angular distance from the mode along a set of rays that is still inside
+            rs = np.linspace(0, np.pi, 513)
+            azs = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+            rr, aa = np.meshgrid(rs, azs)
+            ok = self.log_pdf(to_sphere(rr * np.cos(aa), rr * np.sin(aa)).reshape(-1, 3)) >= log_levels.min()
+            rr = rr.ravel()
+            radius = min(np.pi, 1.2 * rr[ok].max() + 2 * np.pi / npts) if np.any(ok) else np.pi
+
+        us = np.linspace(-radius, radius, npts)
+        uu, vv = np.meshgrid(us, us)
+        values = self.log_pdf(to_sphere(uu, vv).reshape(-1, 3)).reshape(uu.shape)
+        # points beyond the antipode are not on the sphere; pad so that all contours close
+        floor = values.min() - 1.
+        values[np.hypot(uu, vv) > np.pi] = floor
+        values = np.pad(values, 1, mode='constant', constant_values=floor)
+        us = np.pad(us, 1, mode='reflect', reflect_type='odd')
+
+        retval = []
+        for lev in log_levels:
+            retval.append([
+                FB8Distribution.gamma1_to_spherical_coordinates(to_sphere(*pline.T))
+                for pline in _marching_squares(values, lev, us, us)])
+        return retval
+
     def __repr__(self):
         return 'fb8({:.2f}, {:.2f}, {:.2f}, {:.2f}, {:.2f}, {:.2f}, {:.2f}, {:.2f})'.format(self.theta, self.phi, self.psi, self.kappa, self.beta, self.eta, self.alpha, self.rho)
 
 
-def kent_me(xs):
-    """Generates and returns a FB8Distribution based on a FB5 (Kent) moment estimation."""
-    lenxs = len(xs)
-    xbar = np.average(xs, 0)  # average direction of samples from origin
+def kent_me(xs, weights=None):
+    """
+    Generates and returns a FB8Distribution based on a FB5 (Kent) moment estimation.
+    If given, the moments are weighted by weights.
+    """
+    xbar = np.average(xs, 0, weights)  # average direction of samples from origin
     # dispersion (or covariance) matrix around origin
-    S = np.average(xs.reshape((lenxs, 3, 1)) * xs.reshape((lenxs, 1, 3)), 0)
+    if weights is None:
+        S = np.einsum('ni,nj->ij', xs, xs) / len(xs)
+    else:
+        S = np.einsum('n,ni,nj->ij', weights, xs, xs) / np.sum(weights)
     # has unit length and is in the same direction and parallel to xbar
     gamma1 = xbar / norm(xbar)
     theta, phi = FB8Distribution.gamma1_to_spherical_coordinates(gamma1)
@@ -1100,6 +2073,7 @@ def kent_me(xs):
     Ht = FB8Distribution.create_matrix_Ht(theta, phi)
     B = MMul(Ht, MMul(S, H))
 
+    from scipy.linalg import eig
     eigvals, eigvects = eig(B[1:, 1:])
     eigvals = np.real(eigvals)
     if eigvals[0] < eigvals[1]:
@@ -1125,6 +2099,196 @@ def kent_me(xs):
     return fb84(G, kappa, beta)
 
 
+def kent_me_many(datasets, groups=None):
+    """
+    Generates FB5 (Kent) moment estimates for many datasets at once.
+
+    The means and scatter matrices of all datasets are accumulated with bincount, without
+    forming the (N, 3, 3) outer products, and the 2x2 blocks are diagonalized in a single
+    batched eigh call.
+
+    Input:
+      - datasets: a list of arrays with shape (N_i, 3), or a single array with shape (N, 3)
+        in which case groups must be given
+      - groups: integer ids 0...G-1 that assign every row of datasets to a group
+    Output:
+      - a list with a FB8Distribution for every dataset (group)
+
+    >>> from numpy.random import seed
+    >>> seed(12)
+    >>> xss = [fb8(0.5, 1.0, 0.2, 20., 5.).rvs(300), fb8(2.0, -1.0, 0.0, 50., 1.).rvs(500)]
+    >>> for k, xs in zip(kent_me_many(xss), xss):
+    ...     k_me = kent_me(xs)
+    ...     assert np.all(np.abs(k.gamma1 - k_me.gamma1) < 1e-12)
+    ...     assert np.abs(k.kappa - k_me.kappa) < 1e-8 and np.abs(k.beta - k_me.beta) < 1e-8
+    """
+    if groups is None:
+        xs = np.concatenate(datasets)
+        groups = np.repeat(np.arange(len(datasets)), [len(_) for _ in datasets])
+    else:
+        xs = np.asarray(datasets)
+        groups = np.asarray(groups)
+    ngroups = groups.max() + 1
+    counts = np.bincount(groups, minlength=ngroups).astype(np.float64)
+    xbar = np.stack([np.bincount(groups, xs[:, i], ngroups) for i in range(3)], -1) / counts[:, None]
+    S = np.empty((ngroups, 3, 3))
+    for i in range(3):
+        for j in range(i, 3):
+            S[:, i, j] = S[:, j, i] = np.bincount(groups, xs[:, i] * xs[:, j], ngroups) / counts
+
+    r1 = norm(xbar, -1)
+    gamma1 = xbar / r1[:, None]
+    theta, phi = FB8Distribution.gamma1_to_spherical_coordinates(gamma1)
+    H = FB8Distribution.create_matrix_H(theta, phi).reshape(ngroups, 3, 3)
+    Ht = np.swapaxes(H, -2, -1)
+    B = MMul(Ht, MMul(S, H))
+
+    # eigh sorts in ascending order, flip to descending and keep K a proper rotation
+    eigvals, eigvects = np.linalg.eigh(B[:, 1:, 1:])
+    eigvals, eigvects = eigvals[:, ::-1], eigvects[:, :, ::-1]
+    eigvects[:, :, 1] *= np.sign(np.linalg.det(eigvects))[:, None]
+    K = np.tile(np.eye(3), (ngroups, 1, 1))
+    K[:, 1:, 1:] = eigvects
+    G = MMul(H, K)
+
+    r2 = eigvals[:, 0] - eigvals[:, 1]
+    min_kappa = FB8Distribution.minimum_value_for_kappa
+    kappa = np.maximum(min_kappa, 1.0 / (2.0 - 2.0 * r1 - r2) +
+                       1.0 / (2.0 - 2.0 * r1 + r2))
+    beta = 0.5 * (1.0 / (2.0 - 2.0 * r1 - r2) - 1.0 / (2.0 - 2.0 * r1 + r2))
+
+    return [fb84(_G, _kappa, _beta) for _G, _kappa, _beta in zip(G, kappa, beta)]
+
+
+def sufficient_statistics(xs, weights=None):
+    """
+    Returns the sufficient statistics (w, s, S) of the values xs on the sphere with
+      w = sum_i w_i,  s = sum_i w_i x_i,  S = sum_i w_i x_i x_i^T
+    The log_pdf is linear in x and x x^T, so the log likelihood and its derivatives only
+    depend on these, see fb8_log_likelihood().
+    """
+    xs = np.atleast_2d(xs)
+    if weights is None:
+        return float(len(xs)), xs.sum(axis=0), np.dot(xs.T, xs)
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights.sum(), np.dot(weights, xs), np.dot(xs.T * weights, xs)
+
+
+def _fb8_kernel(x, stats, grad, rotation=None, shape=None):
+    """
+    Returns the log likelihood (or its gradient) for the parameter vector x given the
+    sufficient statistics stats. If rotation is given, it is a function that returns Gamma
+    and its derivatives wrt x[:3], which then replace theta, phi, psi. If given, shape is an
+    FB8Distribution with the shape parameters of x whose normalization is used.
+    """
+    kappa, beta, eta, alpha, rho = tuple(x[3:]) + (1., 0., 0.)[len(x)-5:]
+    w, s, S = stats
+    if shape is None:
+        shape = FB8Distribution._from_shape(kappa, beta, eta, alpha, rho)
+    nu = shape.nu
+    if rotation is None:
+        theta, phi, psi = x[:3]
+        Gamma = FB8Distribution.create_matrix_Gamma(theta, phi, psi)
+    else:
+        Gamma, DGammas = rotation(x[:3])
+    gs = np.dot(Gamma.T, s)
+    SGamma = np.dot(S, Gamma)
+    g2Sg2, g3Sg3 = np.dot(Gamma[:, 1], SGamma[:, 1]), np.dot(Gamma[:, 2], SGamma[:, 2])
+    if not grad:
+        return kappa * np.dot(nu, gs) + beta * (g2Sg2 - eta * g3Sg3) - w * shape.log_normalize()
+    if rotation is None:
+        DGammas = [FB8Distribution.create_matrix_DGamma_theta(theta, phi, psi),
+                   FB8Distribution.create_matrix_DGamma_phi(theta, phi, psi),
+                   FB8Distribution.create_matrix_DGamma_psi(theta, phi, psi)]
+    retval = np.empty(8)
+    for i, DGamma in enumerate(DGammas):
+        retval[i] = (kappa * np.dot(nu, np.dot(DGamma.T, s)) +
+                     2 * beta * (np.dot(DGamma[:, 1], SGamma[:, 1]) -
+                                 eta * np.dot(DGamma[:, 2], SGamma[:, 2])))
+    retval[3] = np.dot(nu, gs)
+    retval[4] = g2Sg2 - eta * g3Sg3
+    retval[5] = -beta * g3Sg3
+    retval[6] = kappa * np.dot(shape.Dnu_alpha, gs)
+    retval[7] = kappa * np.dot(shape.Dnu_rho, gs)
+    retval[3:] -= w * np.asarray(shape._grad_log_normalize())
+    return retval
+
+
+def _cross_matrix(v):
+    """Returns the matrix [v] with [v] y = v x y."""
+    return np.array([[0., -v[2], v[1]],
+                     [v[2], 0., -v[0]],
+                     [-v[1], v[0], 0.]])
+
+
+def _rotation_matrix(omega):
+    """Returns the rotation by the angle |omega| around omega (Rodrigues' formula)."""
+    angle = norm(omega)
+    K = _cross_matrix(omega)
+    if angle < 1e-8:
+        return np.eye(3) + K + np.dot(K, K) / 2
+    return (np.eye(3) + np.sin(angle) / angle * K +
+            (1 - np.cos(angle)) / angle**2 * np.dot(K, K))
+
+
+def _grad_rotation_matrix(omega, R=None):
+    """
+    Returns the derivatives of _rotation_matrix(omega) wrt the components of omega,
+    dR/domega_i = (omega_i [omega] + [omega x (1 - R) e_i]) R / |omega|**2
+    (Gallego and Yezzi 2015), which tend to [e_i] for omega -> 0.
+    """
+    if R is None:
+        R = _rotation_matrix(omega)
+    angle2 = np.dot(omega, omega)
+    es = np.eye(3)
+    if angle2 < 1e-16:
+        return [_cross_matrix(_) for _ in es]
+    K = _cross_matrix(omega)
+    return [np.dot(omega[i] * K + _cross_matrix(np.cross(omega, np.dot(es - R, es[i]))), R) / angle2
+            for i in range(3)]
+
+
+def _rotation_vector(R):
+    """Returns omega with _rotation_matrix(omega) = R for |omega| <= pi."""
+    v = np.array([R[2, 1] - R[1, 2], R[0, 2] - R[2, 0], R[1, 0] - R[0, 1]])
+    angle = np.arccos(np.clip((np.trace(R) - 1) / 2, -1, 1))
+    if angle < 1e-8:
+        return v / 2
+    if np.pi - angle < 1e-6:
+        # R = 2 n n^T - 1
+        B = (R + np.eye(3)) / 2
+        i = np.argmax(np.diag(B))
+        return angle * B[:, i] / np.sqrt(B[i, i])
+    return angle / (2 * np.sin(angle)) * v
+
+
+def fb8_log_likelihood(x, stats):
+    """
+    Returns the log likelihood of the FB8 distribution with the parameter vector
+    x = theta, phi, psi, kappa, beta[, eta, alpha, rho] given the sufficient statistics
+    stats = sufficient_statistics(xs). No FB8Distribution is set up and nothing depends on
+    the number of values, which makes this the evaluation kernel for optimizers and samplers.
+    Only the normalization is cached between calls.
+
+    >>> xs = fb8(0.5, 1.0, 0.3, 20., 6., -0.5, 0.7, 0.4).rvs(100)
+    >>> stats = sufficient_statistics(xs)
+    >>> x = [0.4, 1.1, 0.2, 18., 5., -0.4, 0.8, 0.3]
+    >>> print(np.isclose(fb8_log_likelihood(x, stats), fb8(*x).log_likelihood(xs)))
+    True
+    >>> print(np.allclose(fb8_grad_log_likelihood(x, stats), fb8(*x).grad_log_likelihood(xs)))
+    True
+    """
+    return _fb8_kernel(x, stats, False)
+
+
+def fb8_grad_log_likelihood(x, stats):
+    """
+    Returns the gradient of the log likelihood over all 8 parameters for the parameter
+    vector x given the sufficient statistics stats, see fb8_log_likelihood().
+    """
+    return _fb8_kernel(x, stats, True)
+
+
 def __fb8_mle_output1(k_me, callback):
     print()
     print("******** Maximum Likelihood Estimation ********")
@@ -1141,12 +2305,236 @@ def __fb8_mle_output1(k_me, callback):
     print("[iteration]   fb8(theta, phi, psi, kappa, beta, eta, alpha, rho)   -L")
 
 
-def fb8_mle(xs, verbose=False, return_intermediate_values=False, warning='warn', fb5_only=False):
+# bounds of theta phi psi kappa beta eta alpha rho for the L-BFGS-B fits
+_FB8_LB = [0.,-np.pi,-np.pi,0,0,-1,0.01,-np.pi]
+_FB8_UB = [np.pi, np.pi, np.pi, None, None, 1, np.pi, np.pi]
+
+
+class FB8FitTimeout(RuntimeError):
+    """Raised by fb8_mle when a fit exceeds its timeout."""
+    pass
+
+
+class _FB8Objective(object):
+    """
+    The minus log likelihood -k.log_likelihood(xs, weights)/sum(weights) and its gradient
+    for fb8_mle as a function of x = theta phi psi kappa beta eta alpha rho, evaluated from
+    the sufficient statistics of xs, see fb8_log_likelihood(). Alternatively the sufficient
+    statistics are given as stats, e.g. running statistics of a stream. Unlike a closure
+    this can be pickled and sent to worker processes.
+    """
+    def __init__(self, xs=None, timeout=None, weights=None, stats=None):
+        self.stats = sufficient_statistics(xs, weights) if stats is None else stats
+        self.wsum = self.stats[0]
+        self.deadline = None if timeout is None else time.time() + timeout
+
+    def _check_deadline(self):
+        if self.deadline is not None and time.time() > self.deadline:
+            raise FB8FitTimeout('fb8_mle exceeded its timeout')
+
+    def __call__(self, x):
+        self._check_deadline()
+        if np.any(np.isnan(x)):
+            return np.inf
+        if x[3] < 0 or x[4] < 0 or (len(x) > 5 and np.abs(x[5]) > 1):
+            return np.inf
+        return -fb8_log_likelihood(x, self.stats)/self.wsum
+
+    def jac(self, x):
+        self._check_deadline()
+        if np.any(np.isnan(x)):
+            return np.zeros(len(x))
+        if x[3] < 0 or x[4] < 0:
+            return np.zeros(len(x))
+        return -fb8_grad_log_likelihood(x, self.stats)[:len(x)]/self.wsum
+
+    def hess(self, x):
+        self._check_deadline()
+        n = len(x)
+        if np.any(np.isnan(x)):
+            return np.zeros((n, n))
+        if x[3] < 0 or x[4] < 0 or (n > 5 and np.abs(x[5]) > 1):
+            return np.zeros((n, n))
+        return -fb8(*x)._hess_log_likelihood_stats(*self.stats)[:n, :n]/self.wsum
+
+    def to_angles(self, x):
+        return x
+
+    def from_angles(self, x):
+        return x
+
+
+class _FB8RotvecObjective(_FB8Objective):
+    """
+    Like _FB8Objective but with the orientation parameterized by the rotation vector
+    omega = x[:3] as Gamma = R(omega) Gamma0. Unlike theta, phi, psi this is regular at the
+    poles and for small omega the parameters are locally orthogonal wherever Gamma0 points.
+
+    >>> from scipy.optimize import check_grad
+    >>> np.random.seed(0)
+    >>> k = fb8(0.02, 0.5, 0.3, 20., 6., 0.5, 0.4, 0.3)
+    >>> objective = _FB8RotvecObjective(k.rvs(100), k.Gamma)
+    >>> for x in [[0.1, -0.2, 0.3, 20., 6., 0.5, 0.4, 0.3], [0., 0., 0., 20., 6., 0.5, 0.4, 0.3],
+    ...           [0., 0., 0., 20., 6.]]:
+    ...     if check_grad(objective, objective.jac, x) > 1e-5:
+    ...         print(x, check_grad(objective, objective.jac, x))
+    """
+    def __init__(self, xs, Gamma0, timeout=None, weights=None):
+        _FB8Objective.__init__(self, xs, timeout, weights)
+        self.Gamma0 = Gamma0
+
+    def rotation(self, omega):
+        R = _rotation_matrix(omega)
+        return (np.dot(R, self.Gamma0),
+                [np.dot(_, self.Gamma0) for _ in _grad_rotation_matrix(omega, R)])
+
+    def __call__(self, x):
+        self._check_deadline()
+        if np.any(np.isnan(x)):
+            return np.inf
+        if x[3] < 0 or x[4] < 0 or (len(x) > 5 and np.abs(x[5]) > 1):
+            return np.inf
+        return -_fb8_kernel(x, self.stats, False, self.rotation)/self.wsum
+
+    def jac(self, x):
+        self._check_deadline()
+        if np.any(np.isnan(x)):
+            return np.zeros(len(x))
+        if x[3] < 0 or x[4] < 0:
+            return np.zeros(len(x))
+        return -_fb8_kernel(x, self.stats, True, self.rotation)[:len(x)]/self.wsum
+
+    def to_angles(self, x):
+        Gamma = np.dot(_rotation_matrix(x[:3]), self.Gamma0)
+        theta, phi, psi = FB8Distribution.gammas_to_spherical_coordinates(Gamma[:, 0], Gamma[:, 1])
+        return np.concatenate(([float(theta), float(phi), float(psi)], x[3:]))
+
+    def from_angles(self, x):
+        Gamma = FB8Distribution.create_matrix_Gamma(*x[:3])
+        return np.concatenate((_rotation_vector(np.dot(Gamma, self.Gamma0.T)), x[3:]))
+
+
+# constraints kappa, beta >= 0 and 2*beta <= kappa for the FB5 fit (Kent 1982)
+def _fb5_ovalness_constraint(x):
+    return x[3] - 2 * x[4]
+
+
+def _kappa_constraint(x):
+    return x[3]
+
+
+def _beta_constraint(x):
+    return x[4]
+
+
+def _fb8_feasible(x, fb5_only=False):
+    """
+    Returns whether x = theta phi psi kappa beta [eta alpha rho] satisfies the bounds of the
+    fit on kappa, beta and eta and for fb5_only the FB5 constraint 2*beta <= kappa.
+    """
+    if not (x[3] >= 0 and x[4] >= 0 and (len(x) < 6 or abs(x[5]) <= 1)):
+        return False
+    return not fb5_only or _fb5_ovalness_constraint(x) >= 0
+
+
+def _fb8_refine(objective, x_start, fb5_only=False):
+    """
+    Minimizes objective (see _FB8Objective) from x_start = theta phi psi kappa beta eta alpha
+    rho with the last stage of fb8_mle only, i.e. SLSQP with the FB5 constraints if fb5_only
+    and L-BFGS-B within the FB8 bounds otherwise. Returns the scipy.optimize.OptimizeResult.
+    """
+    from scipy.optimize import minimize
+    if fb5_only:
+        cons = ({"type": "ineq", "fun": _fb5_ovalness_constraint},
+                {"type": "ineq", "fun": _kappa_constraint},
+                {"type": "ineq", "fun": _beta_constraint})
+        retval = minimize(objective, np.asarray(x_start)[:5], jac=objective.jac, method="SLSQP",
+                          constraints=cons, options={"ftol": 1e-08, "maxiter": 100})
+        # SLSQP may end marginally below kappa, beta = 0, e.g. at beta = -1e-29, where the
+        # objective is inf
+        if retval.x[3] < 0 or retval.x[4] < 0:
+            retval.x = np.concatenate((retval.x[:3], np.maximum(retval.x[3:], 0.)))
+            retval.fun = objective(retval.x)
+        return retval
+    bounds = list(zip(_FB8_LB, _FB8_UB))
+    x_start = np.clip(x_start, [_[0] for _ in bounds],
+                      [np.inf if _[1] is None else _[1] for _ in bounds])
+    return minimize(objective, x_start, jac=objective.jac, method="L-BFGS-B",
+                    bounds=bounds, options={'ftol': 1e-8, 'gtol': 1e-4})
+
+
+def _fb8_starts(x, n_starts):
+    """
+    Generates n_starts starting points for the FB8 stage from theta, phi, psi, kappa, beta
+    in x. nu is spread over the sphere along a Fibonacci spiral in (alpha, rho) and the
+    sign of eta alternates.
+    """
+    i = np.arange(n_starts)
+    alphas = np.arccos(1 - 2 * (i + 0.5) / n_starts)
+    rhos = np.mod(np.pi * (3 - np.sqrt(5)) * i + np.pi, 2 * np.pi) - np.pi
+    etas = np.where(i % 2 == 0, 0.9, -0.9)
+    return [np.concatenate((x, _)) for _ in zip(etas, alphas, rhos)]
+
+
+class _EarlyStop(Exception):
+    pass
+
+
+class _BestSoFar(object):
+    """Thread-safe record of the lowest objective value seen by any start."""
+    def __init__(self, value=np.inf):
+        self.value = value
+        self._lock = threading.Lock()
+
+    def update(self, value):
+        with self._lock:
+            if value < self.value:
+                self.value = value
+            return self.value
+
+
+class _EarlyStopCallback(object):
+    """
+    Callback for one start of the multi-start FB8 stage. Aborts the start with _EarlyStop
+    once its objective is more than tol above the best value of all starts after patience
+    iterations. The start minimizes fun(), which records the objective values the optimizer
+    evaluates, so that the callback does not evaluate the objective at the iterate again.
+    """
+    def __init__(self, objective, best, tol, callback=None, patience=10):
+        self.objective = objective
+        self.best = best
+        self.tol = tol
+        self.callback = callback
+        self.patience = patience
+        self.niter = 0
+        self._x = self._fun = None
+
+    def fun(self, x):
+        fun = self.objective(x)
+        self._x, self._fun = np.array(x), fun
+        return fun
+
+    def __call__(self, x):
+        if self.callback is not None:
+            self.callback(x)
+        self.niter += 1
+        if self._x is not None and np.array_equal(x, self._x):
+            fun = self._fun
+        else:
+            fun = self.objective(x)
+        best = self.best.update(fun)
+        if self.niter >= self.patience and fun > best + self.tol:
+            raise _EarlyStop
+
+
+def fb8_mle(xs, verbose=False, return_intermediate_values=False, warning='warn', fb5_only=False,
+            timeout=None, n_starts=0, workers=None, early_stop_tol=1e-2, newton=False,
+            weights=None, orientation='angles'):
     """
     Generates a FB8Distribution fitted to xs using maximum likelihood estimation
     For a first approximation kent_me() is used. The function
-    -k.log_likelihood(xs)/len(xs) (where k is an instance of FB8Distribution) is
-    minimized. If fb5_only=False, sequentially fit a Kent, FB6 and then FB8
+    -k.log_likelihood(xs, weights)/sum(weights) (where k is an instance of FB8Distribution)
+    is minimized. If fb5_only=False, sequentially fit a Kent, FB6 and then FB8
     distribution. Gradients are used for the FB6 and FB8 fits.
 
     Input:
@@ -1160,62 +2548,96 @@ def fb8_mle(xs, verbose=False, return_intermediate_values=False, warning='warn',
           (e.g. stdout)
         - "none": or any other value for this argument results in no warnings to be issued
       - fb5_only: perform fit to Kent distribution only
+      - timeout: if given, FB8FitTimeout is raised when the fit takes longer than timeout seconds
+      - n_starts: number of additional starting points for the FB8 stage, spread over
+        (alpha, rho) with alternating signs of eta. An additional start is abandoned once its
+        -L/len(xs) exceeds the best value found by any start by more than early_stop_tol
+      - workers: number of threads that run the FB8 starts concurrently
+      - newton: if True, the optimum of the stages above is polished with a trust-region
+        Newton method (scipy's trust-exact) that uses the analytic Hessian of the log
+        likelihood. This adds to the cost of the fit. The polished optimum is only used if
+        trust-exact converged, it improves the likelihood and it satisfies
+        kappa, beta >= 0, |eta| <= 1 and for fb5_only 2*beta <= kappa
+      - weights: weight of every value in xs, e.g. counts of binned values (see
+        fb8_mle_binned) or importance weights. Defaults to 1
+      - orientation: parameterization of the orientation in the optimizers, choices are
+        - "angles": theta, phi, psi, which are degenerate at theta = 0 and pi
+        - "rotvec": a rotation vector omega relative to the moment estimate, i.e.
+          Gamma = R(omega) Gamma_me, which is regular everywhere on the sphere. It cannot
+          be combined with newton=True, which needs the Hessian wrt theta, phi, psi
     Output:
       - an instance of the fitted FB8Distribution
     Extra output:
       - if return_intermediate_values is specified then
       a tuple is returned with the FB8Distribution argument as the first element
       and containing the extra requested values in the rest of the elements.
+
+    Additional starts in concurrent threads find the same optimum as the default starts here
+
+    >>> np.random.seed(0)
+    >>> xs = fb8(0.5, 1.0, 0.3, 8., 3., 0.5, 0.5, 0.6).rvs(200)
+    >>> llh = fb8_mle(xs, warning='none').log_likelihood(xs)
+    >>> k = fb8_mle(xs, warning='none', n_starts=4, workers=2, early_stop_tol=1e-2)
+    >>> print(np.isclose(k.log_likelihood(xs), llh), k.log_likelihood(xs) > llh - 1e-6)
+    True True
+
+    The rotation vector reaches the same optimum as theta, phi, psi, with no more iterations
+    near the pole than elsewhere on the sphere
+
+    >>> n_iterations = []
+    >>> for theta in [0.02, 1.2]:
+    ...     np.random.seed(0)
+    ...     xs = fb8(theta, 0.5, 0.3, 30., 8.).rvs(300)
+    ...     (k_angles, angles), (k_rotvec, rotvec) = [
+    ...         fb8_mle(xs, warning='none', fb5_only=True, orientation=_,
+    ...                 return_intermediate_values=True) for _ in ['angles', 'rotvec']]
+    ...     n_iterations.append(len(rotvec))
+    ...     print(abs(k_rotvec.log_likelihood(xs) - k_angles.log_likelihood(xs)) < 1e-3,
+    ...           len(rotvec) <= len(angles))
+    True True
+    True True
+    >>> print(n_iterations[0] <= n_iterations[1])
+    True
     """
-    lenxs = len(xs)
-    # method that generates the minus L to be minimized
-    # x = theta phi psi kappa beta eta alpha rho
-    def minus_log_likelihood(x):
-        if np.any(np.isnan(x)):
-            return np.inf
-        if x[3] < 0 or x[4] < 0:
-            return np.inf
-        ### DEBUG ###
-        # if len(x) > 5 and (x[5] > 1 or x[5] < -1):
-        #     return np.inf
-        return -fb8(*x).log_likelihood(xs)/lenxs
+    from scipy.optimize import minimize
+    if newton and orientation == 'rotvec':
+        raise ValueError("newton=True requires orientation='angles'")
+    # first get estimated moments
+    k_me = kent_me(xs, weights)
+    theta, phi, psi, kappa, beta = k_me.theta, k_me.phi, k_me.psi, k_me.kappa, k_me.beta
 
-    def jac(x):
-        if np.any(np.isnan(x)):
-            return np.zeros(8)
-        if x[3] < 0 or x[4] < 0:
-            return np.zeros(8)
-        return -np.asarray(fb8(*x).grad_log_likelihood(xs)[:len(x)])/lenxs
+    if orientation == 'rotvec':
+        minus_log_likelihood = _FB8RotvecObjective(xs, k_me.Gamma, timeout, weights)
+    else:
+        minus_log_likelihood = _FB8Objective(xs, timeout, weights)
+    jac = minus_log_likelihood.jac
+    to_angles, from_angles = minus_log_likelihood.to_angles, minus_log_likelihood.from_angles
 
     # callback for keeping track of the values
     intermediate_values = list()
 
     def callback(x, output_count=[0]):
-        kx = fb8(*x)
-        minusL = -kx.log_likelihood(xs)
+        kx = fb8(*to_angles(x))
+        minusL = -kx.log_likelihood(xs, weights)
         imv = intermediate_values
         imv.append((x, minusL))
         if verbose:
             print(len(imv), kx, minusL)
 
-    # first get estimated moments
-    k_me = kent_me(xs)
-    theta, phi, psi, kappa, beta = k_me.theta, k_me.phi, k_me.psi, k_me.kappa, k_me.beta
-
     # here the mle is done
-    x_start = np.array([theta, phi, psi, kappa, beta])
-    y_start = np.array([theta, phi, psi, beta, kappa, -0.99])
+    x_start = from_angles(np.array([theta, phi, psi, kappa, beta]))
+    y_start = from_angles(np.array([theta, phi, psi, beta, kappa, -0.99]))
 
     # First try a FB5 fit
     # constrain kappa, beta >= 0 and 2*beta <= kappa for FB5 (Kent 1982)
     if verbose:
-        __fb8_mle_output1(fb8(*x_start), callback)
+        __fb8_mle_output1(fb8(*to_angles(x_start)), callback)
     cons = ({"type": "ineq",
-             "fun": lambda x: x[3] - 2 * x[4]},
+             "fun": _fb5_ovalness_constraint},
             {"type": "ineq",
-             "fun": lambda x: x[3]},
+             "fun": _kappa_constraint},
             {"type": "ineq",
-             "fun": lambda x: x[4]})
+             "fun": _beta_constraint})
     all_values = minimize(minus_log_likelihood,
                           x_start,
                           method="SLSQP",
@@ -1228,7 +2650,7 @@ def fb8_mle(xs, verbose=False, return_intermediate_values=False, warning='warn',
         # Then try a FB6 fit with seed: eta = -0.99
         # note eta=-1 with 2*beta >= kappa is the small-circle distribution (Bingham-Mardia 1978)
         if verbose:
-            __fb8_mle_output1(fb8(*y_start), callback)
+            __fb8_mle_output1(fb8(*to_angles(y_start)), callback)
         ### constraint for SLSQP ###
         # cons = ({"type": "ineq", # kappa >= 0
         #          "fun": lambda x: x[3]},
@@ -1238,8 +2660,9 @@ def fb8_mle(xs, verbose=False, return_intermediate_values=False, warning='warn',
         #          "fun": lambda x: 1 - np.abs(x[5])})
         #         # {"type": "ineq",
         #         #  "fun": lambda x: -x[3] + 2 * x[4]})
-        lb = [0.,-np.pi,-np.pi,0,0,-1,0.01,-np.pi]
-        ub = [np.pi, np.pi, np.pi, None, None, 1, np.pi, np.pi]
+        lb, ub = _FB8_LB, _FB8_UB
+        if orientation == 'rotvec':
+            lb, ub = [None] * 3 + lb[3:], [None] * 3 + ub[3:]
         _y = minimize(minus_log_likelihood,
                       y_start,
                       jac=jac,
@@ -1249,34 +2672,63 @@ def fb8_mle(xs, verbose=False, return_intermediate_values=False, warning='warn',
 
         # Choose better of FB5 vs FB6 as another seed for FB8
         # Last three parameters determine if FB5, FB6, or FB8
-        z_starts = [np.array([np.abs(theta-np.pi/2), phi, psi, beta, kappa, -0.9, np.pi/4, 0.]),]
+        z_starts = [from_angles(np.array([np.abs(theta-np.pi/2), phi, psi, beta, kappa, -0.9, np.pi/4, 0.])),]
         if _y.success and _y.fun < all_values.fun:
             all_values = _y
             z_starts.append(np.concatenate((_y.x, [0.2,0.])))
         else:
             z_starts.append(np.concatenate((all_values.x, [0.9,0.2,0.])))
 
-        for z_start in z_starts:
+        # the additional starts are abandoned early if they are clearly worse than the best so far
+        early_stop = [False] * len(z_starts)
+        if n_starts:
+            z_starts += _fb8_starts(all_values.x[:5], n_starts)
+            early_stop += [True] * n_starts
+            best = _BestSoFar(all_values.fun)
+
+        def refine(z_start, early_stop):
             if verbose:
-                __fb8_mle_output1(fb8(*z_start), callback)
-            # _z = basinhopping(minus_log_likelihood,
-            #                   z_start,
-            #                   niter=10,
-            #                   niter_success=3,
-            #                   minimizer_kwargs= dict(
-            #                       method="L-BFGS-B",
-            #                       callback=callback,
-            #                       options={"disp": False,
-            #                                "maxiter": 100})).lowest_optimization_result
-            _z = minimize(minus_log_likelihood,
-                          z_start,
-                          jac=jac,
-                          method="L-BFGS-B",
-                          bounds=list(zip(lb, ub)),
-                          callback=callback,
-                          options={'ftol':1e-8, 'gtol':1e-4})
-            if _z.success and _z.fun < all_values.fun:
+                __fb8_mle_output1(fb8(*to_angles(z_start)), callback)
+            if not early_stop:
+                _fun, _callback = minus_log_likelihood, callback
+            else:
+                _callback = _EarlyStopCallback(minus_log_likelihood, best, early_stop_tol, callback)
+                _fun = _callback.fun
+            try:
+                return minimize(_fun,
+                                z_start,
+                                jac=jac,
+                                method="L-BFGS-B",
+                                bounds=list(zip(lb, ub)),
+                                callback=_callback,
+                                options={'ftol':1e-8, 'gtol':1e-4})
+            except _EarlyStop:
+                return None
+
+        if workers is None or workers == 1:
+            _zs = [refine(*_) for _ in zip(z_starts, early_stop)]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                _zs = list(executor.map(refine, z_starts, early_stop))
+        for _z in _zs:
+            if _z is not None and _z.success and _z.fun < all_values.fun:
                 all_values = _z
+    if orientation == 'rotvec':
+        all_values.x = to_angles(all_values.x)
+    if newton:
+        if verbose:
+            __fb8_mle_output1(fb8(*all_values.x), callback)
+        _n = minimize(minus_log_likelihood,
+                      all_values.x,
+                      jac=minus_log_likelihood.jac,
+                      hess=minus_log_likelihood.hess,
+                      method="trust-exact",
+                      callback=callback,
+                      options={'gtol': 1e-6, 'maxiter': 100})
+        # trust-exact is unconstrained
+        if _n.success and _n.fun < all_values.fun and _fb8_feasible(_n.x, fb5_only):
+            all_values = _n
     if not all_values.success:
         warning_message = all_values.message
         if warning == "warn":
@@ -1292,6 +2744,40 @@ def fb8_mle(xs, verbose=False, return_intermediate_values=False, warning='warn',
     return k
 
 
+def fb8_mle_binned(counts, centres=None, nest=False, **kwargs):
+    """
+    Generates a FB8Distribution fitted to binned values, e.g. a sky map of event counts.
+    Every occupied pixel enters fb8_mle as its centre with its count as weight, so that the
+    cost of the fit depends on the number of occupied pixels rather than on the number of
+    events. The pixels should be small compared to the width of the distribution.
+
+    Input:
+      - counts: number of values in each pixel
+      - centres: the pixel centres, ordering is (z, x, y). If None, counts is a HEALPix map
+        in RING (or NESTED if nest=True) ordering and the centres are computed with healpy
+      - all other keyword arguments are passed on to fb8_mle
+    Output:
+      - an instance of the fitted FB8Distribution (or the output of fb8_mle)
+
+    >>> from numpy.random import seed
+    >>> seed(4)
+    >>> xs = fb8(0.5, 1.0, 0.3, 20., 5.).rvs(2000)
+    >>> centres, pixels = np.unique(np.round(xs, 1), axis=0, return_inverse=True)
+    >>> centres = centres / norm(centres, 1)[:, None]
+    >>> k = fb8_mle_binned(np.bincount(pixels.ravel()), centres, fb5_only=True)
+    >>> print(np.abs(k.kappa - fb8_mle(xs, fb5_only=True).kappa) < 2)
+    True
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    if centres is None:
+        import healpy as hp
+        nside = hp.npix2nside(len(counts))
+        x, y, z = hp.pix2vec(nside, np.arange(len(counts)), nest=nest)
+        centres = np.array([z, x, y]).T
+    occupied = counts > 0
+    return fb8_mle(np.asarray(centres)[occupied], weights=counts[occupied], **kwargs)
+
+
 if __name__ == "__main__":
     __doc__ += """
 >>> import numpy as np
@@ -0,0 +1,146 @@
+"""
+Opt-in metrics of the normalization backends, the series, their fallbacks, the caches and
+the rejection sampling, e.g. to find out why some fits take seconds.
+
+Nothing is recorded unless a MetricsRegistry is enabled, in which case the instrumented code
+paths count events and observe values and wall times in histograms with power of two
+buckets. Counters have labels, e.g. the reason of a fallback or whether a lookup hit a
+cache, and rate() returns the fraction of a label. The recorded names are
+
+  - normalize.cache: lookups of the series cache of normalize(), hit or miss
+  - normalize.series.time, normalize.series.blocks: wall time and number of blocks of
+    terms of the series of normalize()
+  - normalize.series_failure: reason why the FB8 series was not used
+  - normalize.fallback: laplace or numerical, the replacement of a failed FB8 series
+  - normalize.numerical.time, normalize.laplace.time: wall times of _nnormalize() and of
+    _laplace_log_normalize()
+  - log_normalize.backend.time: wall time of an enabled cache or surrogate
+  - log_normalize.series_failure: reason why log_normalize() used _approx_log_normalize()
+  - log_normalize.approximation.time: wall time of _approx_log_normalize()
+  - grad_log_normalize.series.time, grad_log_normalize.series.blocks: as for normalize()
+  - grad_log_normalize.fallback: approx_fprime if the series of the gradient failed
+  - cache.lookup: memory, database or computed, see NormalizationCache
+  - surrogate.get: inside or outside of the box of an enabled ChebyshevSurrogate, or fixed
+    if it does not serve the requested gradient because a parameter is fixed
+  - rvs.samples: accepted or rejected proposals of the rejection sampling
+
+Metrics are recorded in the process that enabled them, the worker processes of e.g.
+fb8_mle_many() are not included.
+
+>>> from sphere.distribution import fb8
+>>> with collect_metrics() as metrics:
+...     k = fb8(0.1, 0.2, 0.3, 10., 2.)
+...     _ = k.log_normalize()
+...     _ = k.rvs(100)
+>>> snapshot = metrics.snapshot()
+>>> print(snapshot['counters']['normalize.cache'], snapshot['histograms']['normalize.series.time']['count'])
+{'miss': 1} 1
+>>> print(0 < metrics.rate('rvs.samples', 'accepted') < 1)
+True
+"""
+
+import json
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+from . import distribution as _distribution
+
+
+class MetricsRegistry(object):
+    """
+    Labelled counters and histograms, see the module docstring. All methods are thread-safe.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = dict()
+            self._histograms = dict()
+
+    def count(self, name, label='count', n=1):
+        with self._lock:
+            counter = self._counters.setdefault(name, dict())
+            counter[label] = counter.get(label, 0) + n
+
+    def observe(self, name, value):
+        """Adds value to the histogram name, in the bucket of the next power of two."""
+        bucket = math.frexp(value)[1] if value > 0 else None
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = dict(
+                    count=0, sum=0., min=value, max=value, buckets=dict())
+            histogram['count'] += 1
+            histogram['sum'] += value
+            histogram['min'] = min(histogram['min'], value)
+            histogram['max'] = max(histogram['max'], value)
+            histogram['buckets'][bucket] = histogram['buckets'].get(bucket, 0) + 1
+
+    @contextmanager
+    def timer(self, name):
+        """Observes the wall time in seconds of the with block in the histogram name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def rate(self, name, label):
+        """Returns the fraction of the counts of name with label, or nan if there are none."""
+        with self._lock:
+            counter = self._counters.get(name, dict())
+            total = sum(counter.values())
+            return counter.get(label, 0) / total if total else float('nan')
+
+    def snapshot(self):
+        """
+        Returns a copy of all metrics as a dict of plain types that can be dumped to JSON.
+        The buckets of a histogram are a list of [upper limit, count] pairs, where values
+        up to 0 are in the bucket with upper limit 0.
+        """
+        with self._lock:
+            counters = dict((name, dict(counter)) for name, counter in self._counters.items())
+            histograms = dict()
+            for name, histogram in self._histograms.items():
+                _ = dict(histogram)
+                _['buckets'] = sorted([0. if bucket is None else math.ldexp(1., bucket), n]
+                                      for bucket, n in histogram['buckets'].items())
+                histograms[name] = _
+        return dict(counters=counters, histograms=histograms)
+
+    def to_json(self, **kwargs):
+        """Returns the snapshot as JSON, the keyword arguments are passed on to json.dumps."""
+        return json.dumps(self.snapshot(), **kwargs)
+
+
+def enable_metrics(registry=None):
+    """
+    Makes the instrumented code record into registry, a new MetricsRegistry by default.
+    Returns the registry.
+    """
+    if registry is None:
+        registry = MetricsRegistry()
+    _distribution._metrics = registry
+    return registry
+
+
+def disable_metrics():
+    _distribution._metrics = None
+
+
+@contextmanager
+def collect_metrics(registry=None):
+    """
+    Records the metrics of the with block into registry, a new MetricsRegistry by default,
+    which is returned by the context manager. Metrics enabled before are restored afterwards
+    but do not see the metrics of the block.
+    """
+    previous = _distribution._metrics
+    try:
+        yield enable_metrics(registry)
+    finally:
+        _distribution._metrics = previous
@@ -0,0 +1,266 @@
+"""
+Finite mixtures of FB8 distributions, e.g. for multi-clustered sky data, fitted by the
+EM algorithm.
+
+The E-step evaluates the (K, N) matrix of responsibilities chunk by chunk and reduces it
+right away to the weighted sufficient statistics (w_k, s_k, S_k) of every component, see
+sufficient_statistics(). The M-step refits every component to its statistics starting from
+its previous parameters, so an iteration costs O(N*K) plus K fits whose cost does not
+depend on N. The component fits are independent and may run in worker processes.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.special import logsumexp
+
+from .distribution import fb8, fb8_mle, kent_me, norm, _FB8Objective, _fb8_refine
+
+
+def _params(k):
+    return np.array([k.theta, k.phi, k.psi, k.kappa, k.beta, k.eta, k.alpha, k.rho])
+
+
+class FB8Mixture(object):
+    """
+    A mixture sum_k w_k f_k(x) of the FB8Distributions f_k with weights w_k that sum to one.
+
+    >>> from numpy.random import seed
+    >>> seed(0)
+    >>> mix = FB8Mixture([fb8(0.5, 0.0, 0.0, 50., 10.), fb8(2.0, 2.0, 0.0, 20., 5.)], [0.3, 0.7])
+    >>> xs = mix.rvs(1000)
+    >>> print(np.allclose(mix.responsibilities(xs).sum(axis=0), 1))
+    True
+    >>> lpdf = np.log(0.3 * mix.components[0].pdf(xs) + 0.7 * mix.components[1].pdf(xs))
+    >>> print(np.allclose(mix.log_pdf(xs, chunksize=300), lpdf))
+    True
+    """
+    def __init__(self, components, weights):
+        assert len(components) == len(weights)
+        self._components = list(components)
+        self._weights = np.asarray(weights, dtype=np.float64) / np.sum(weights)
+        ks = self._components
+        # parameters of all components stacked for the vectorized log_pdf
+        self._Gammas = np.array([_.Gamma for _ in ks])
+        self._knus = np.array([_.kappa * _.nu for _ in ks])
+        self._betas = np.array([_.beta for _ in ks])
+        self._betaetas = np.array([_.beta * _.eta for _ in ks])
+        self._offsets = np.log(self._weights) - np.array([_.log_normalize() for _ in ks])
+
+    @property
+    def components(self):
+        return self._components
+
+    @property
+    def weights(self):
+        return self._weights
+
+    def _weighted_log_pdfs(self, xs):
+        """Returns log(w_k f_k(x)) with shape (K, N) for xs with shape (N, 3)."""
+        gx = np.einsum('kij,ni->kjn', self._Gammas, xs)
+        return (np.einsum('kj,kjn->kn', self._knus, gx) +
+                self._betas[:, None] * gx[:, 1]**2 - self._betaetas[:, None] * gx[:, 2]**2 +
+                self._offsets[:, None])
+
+    def _chunks(self, xs, chunksize):
+        xs = np.reshape(xs, (-1, 3))
+        for i in range(0, len(xs), chunksize):
+            yield i, xs[i:i + chunksize]
+
+    def log_pdf(self, xs, chunksize=100000):
+        """
+        Returns the log(pdf) of the mixture for xs with shape (N, 3), evaluated in chunks of
+        chunksize values.
+        """
+        xs = np.reshape(xs, (-1, 3))
+        retval = np.empty(len(xs))
+        for i, chunk in self._chunks(xs, chunksize):
+            retval[i:i + len(chunk)] = logsumexp(self._weighted_log_pdfs(chunk), axis=0)
+        return retval
+
+    def pdf(self, xs, chunksize=100000):
+        return np.exp(self.log_pdf(xs, chunksize))
+
+    def log_likelihood(self, xs, weights=None, chunksize=100000):
+        """
+        Returns the log likelihood for xs, optionally weighted by weights.
+        """
+        retval = self.log_pdf(xs, chunksize)
+        if weights is not None:
+            return np.dot(weights, retval)
+        return retval.sum()
+
+    def responsibilities(self, xs, chunksize=100000):
+        """
+        Returns the posterior probabilities (K, N) of the components for every value of xs.
+        """
+        xs = np.reshape(xs, (-1, 3))
+        retval = np.empty((len(self._components), len(xs)))
+        for i, chunk in self._chunks(xs, chunksize):
+            lpdfs = self._weighted_log_pdfs(chunk)
+            retval[:, i:i + len(chunk)] = np.exp(lpdfs - logsumexp(lpdfs, axis=0))
+        return retval
+
+    def rvs(self, n_samples):
+        """
+        Returns n_samples random samples (n_samples, 3) of the mixture in random order.
+        """
+        counts = np.random.multinomial(n_samples, self._weights)
+        xs = np.concatenate([k.rvs(n) for k, n in zip(self._components, counts)])
+        return xs[np.random.permutation(n_samples)]
+
+    def __repr__(self):
+        return 'FB8Mixture([{}], [{}])'.format(
+            ', '.join(repr(_) for _ in self._components),
+            ', '.join('{:.3f}'.format(_) for _ in self._weights))
+
+
+def spherical_kmeans(xs, n_clusters, n_iter=100, weights=None):
+    """
+    Clusters the unit vectors xs by spherical k-means, i.e. by cosine similarity, with
+    k-means++ seeding. Returns the unit cluster centres (n_clusters, 3) and the label of every
+    value.
+    """
+    xs = np.reshape(xs, (-1, 3))
+    if weights is None:
+        weights = np.ones(len(xs))
+    centres = [xs[np.random.choice(len(xs), p=weights / weights.sum())]]
+    for i in range(1, n_clusters):
+        # cosine distance to the closest centre
+        dist = 1 - np.max(np.dot(xs, np.array(centres).T), axis=1)
+        p = weights * np.maximum(dist, 0)
+        centres.append(xs[np.random.choice(len(xs), p=p / p.sum())])
+    centres = np.array(centres)
+    labels = None
+    for i in range(n_iter):
+        new_labels = np.argmax(np.dot(xs, centres.T), axis=1)
+        if labels is not None and np.all(new_labels == labels):
+            break
+        labels = new_labels
+        sums = np.array([np.dot(weights[labels == j], xs[labels == j]) for j in range(n_clusters)])
+        lengths = norm(sums, 1)
+        # keep the previous centre of an empty cluster
+        nonempty = lengths > 0
+        centres[nonempty] = sums[nonempty] / lengths[nonempty, None]
+    return centres, labels
+
+
+def _init_fit(xs, weights, fb5_only):
+    return _params(fb8_mle(xs, fb5_only=fb5_only, warning='none', weights=weights))
+
+
+def _m_step(stats, x, fb5_only):
+    """Refits one component to its sufficient statistics starting from x."""
+    objective = _FB8Objective(stats=stats)
+    _x = _fb8_refine(objective, x, fb5_only)
+    if _x.fun <= objective(x[:len(_x.x)]):
+        return np.concatenate((_x.x, [1., 0., 0.][len(_x.x)-5:]))
+    return x
+
+
+def _e_step(mixture, xs, weights, chunksize):
+    """
+    Returns the log likelihood of xs and the sufficient statistics (w_k, s_k, S_k) of every
+    component weighted by the responsibilities.
+    """
+    n_components = len(mixture.components)
+    llh = 0.
+    w = np.zeros(n_components)
+    s = np.zeros((n_components, 3))
+    S = np.zeros((n_components, 3, 3))
+    for i, chunk in mixture._chunks(xs, chunksize):
+        lpdfs = mixture._weighted_log_pdfs(chunk)
+        lpdf = logsumexp(lpdfs, axis=0)
+        resp = np.exp(lpdfs - lpdf)
+        if weights is not None:
+            resp *= weights[i:i + len(chunk)]
+            lpdf = lpdf * weights[i:i + len(chunk)]
+        llh += lpdf.sum()
+        w += resp.sum(axis=1)
+        s += np.dot(resp, chunk)
+        S += np.einsum('kn,ni,nj->kij', resp, chunk, chunk)
+    return llh, [(w[_], s[_], S[_]) for _ in range(n_components)]
+
+
+def fb8_mixture_mle(xs, n_components, fb5_only=False, max_iter=200, tol=1e-6, weights=None,
+                    chunksize=100000, workers=None, verbose=False,
+                    return_log_likelihoods=False):
+    """
+    Generates a FB8Mixture with n_components components fitted to xs by the EM algorithm.
+    The components are initialised by fb8_mle fits to the clusters of a spherical k-means.
+
+    Input:
+      - xs: values on the sphere, ordering is (z, x, y)
+      - n_components: number of components K
+      - fb5_only: fit mixtures of Kent distributions only
+      - max_iter: maximum number of EM iterations
+      - tol: stop once the log likelihood per unit weight improves by less than tol
+      - weights: weight of every value in xs, defaults to 1
+      - chunksize: number of values per block of the (K, N) responsibility matrix
+      - workers: number of worker processes for the initial fits and the M-steps,
+        defaults to the number of cores. With workers=1 everything runs in the
+        calling process
+      - verbose: if True, the log likelihood of every iteration is printed
+      - return_log_likelihoods: if True, the log likelihoods of all iterations are
+        returned as well
+    Output:
+      - an instance of the fitted FB8Mixture
+    Extra output:
+      - if return_log_likelihoods is specified, a tuple (mixture, log_likelihoods)
+
+    >>> from numpy.random import seed
+    >>> seed(1)
+    >>> mix = FB8Mixture([fb8(0.5, 0.0, 0.0, 50., 10.), fb8(2.0, 2.0, 0.0, 20., 5.)], [0.3, 0.7])
+    >>> xs = mix.rvs(1000)
+    >>> fit, llhs = fb8_mixture_mle(xs, 2, fb5_only=True, workers=1, return_log_likelihoods=True)
+    >>> print(np.all(np.diff(llhs) > -1e-6), fit.log_likelihood(xs) > mix.log_likelihood(xs))
+    True True
+    >>> print(np.round(sorted(fit.weights), 1))
+    [0.3 0.7]
+    """
+    xs = np.reshape(xs, (-1, 3))
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+    wsum = len(xs) if weights is None else weights.sum()
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    _, labels = spherical_kmeans(xs, n_components, weights=weights)
+    clusters = [labels == _ for _ in range(n_components)]
+    cluster_weights = [None if weights is None else weights[_] for _ in clusters]
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    _map = map if executor is None else executor.map
+    try:
+        xs_start = list(_map(_init_fit, [xs[_] for _ in clusters], cluster_weights,
+                             [fb5_only] * n_components))
+        if weights is None:
+            mixture_weights = [_.sum() for _ in clusters]
+        else:
+            mixture_weights = [weights[_].sum() for _ in clusters]
+        mixture = FB8Mixture([fb8(*_) for _ in xs_start], mixture_weights)
+
+        log_likelihoods = []
+        for i in range(max_iter):
+            llh, stats = _e_step(mixture, xs, weights, chunksize)
+            log_likelihoods.append(llh)
+            if verbose:
+                print(i, llh)
+            if i > 0 and llh - log_likelihoods[-2] < tol * wsum:
+                break
+            # a component without any weight keeps its parameters
+            active = [_[0] > 0 for _ in stats]
+            xs_start = [_params(_) for _ in mixture.components]
+            new_xs = list(_map(_m_step, [_ for _, a in zip(stats, active) if a],
+                               [_ for _, a in zip(xs_start, active) if a],
+                               [fb5_only] * sum(active)))
+            for j in np.flatnonzero(active):
+                xs_start[j] = new_xs.pop(0)
+            mixture = FB8Mixture([fb8(*_) for _ in xs_start], [_[0] for _ in stats])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if return_log_likelihoods:
+        return mixture, log_likelihoods
+    return mixture
@@ -0,0 +1,113 @@
+"""
+Online maximum likelihood estimation of the FB8 distribution for streams of directions,
+e.g. for tracking an object whose measured directions keep arriving.
+
+The log_pdf of the FB8 distribution is linear in x and x x^T, so the log likelihood of
+any number of points only depends on the sufficient statistics
+
+  w = sum_i w_i,  s = sum_i w_i x_i,  S = sum_i w_i x_i x_i^T
+
+and the cost of an update does not grow with the length of the history.
+"""
+
+import numpy as np
+
+from .distribution import fb8, fb8_mle, sufficient_statistics, _FB8Objective, _fb8_refine
+
+
+class OnlineFB8(object):
+    """
+    Fits a FB8Distribution to a stream of directions. Every call to update() adds new
+    values to the running sufficient statistics and refits with a single refinement stage
+    that starts from the previous optimum. Only the first refit runs the full fb8_mle, on the
+    values of its update, as the start of the refinement on all values.
+
+    With a forgetting factor lambda < 1 the weight of every value is multiplied by lambda
+    for each value that arrives after it, so that old data fades out with an effective
+    memory of about 1/(1-lambda) values.
+
+    >>> from numpy.random import seed
+    >>> from sphere.distribution import fb8
+    >>> seed(42)
+    >>> k = fb8(1.0, 0.5, 0.3, 30., 8.)
+    >>> online = OnlineFB8(fb5_only=True)
+    >>> for i in range(5):
+    ...     fit = online.update(k.rvs(200))
+    >>> print(online.weight)
+    1000.0
+    >>> xs = k.rvs(1000)
+    >>> online = OnlineFB8(fb5_only=True)
+    >>> fit = online.update(xs[:500])
+    >>> fit = online.update(xs[500:])
+    >>> print(np.abs(fit.log_likelihood(xs) - fb8_mle(xs, fb5_only=True).log_likelihood(xs)) < 1e-3)
+    True
+
+    Values added with refit=False enter the first refit as well
+
+    >>> seed(5)
+    >>> xs = np.concatenate((fb8(0.3, 0.5, 0.2, 30., 8.).rvs(2000), fb8(1.5, 0.5, 0.2, 30., 8.).rvs(20)))
+    >>> online = OnlineFB8(fb5_only=True)
+    >>> _ = online.update(xs[:2000], refit=False)
+    >>> fit = online.update(xs[2000:])
+    >>> print(np.abs(fit.theta - 0.3) < 0.05)
+    True
+    >>> print(np.abs(fit.log_likelihood(xs) - fb8_mle(xs, fb5_only=True).log_likelihood(xs)) < 1e-3)
+    True
+    """
+    def __init__(self, forgetting=1., fb5_only=False):
+        assert 0 < forgetting <= 1
+        self.forgetting = float(forgetting)
+        self.fb5_only = fb5_only
+        self._stats = (0., np.zeros(3), np.zeros((3, 3)))
+        self._fit = None
+
+    @property
+    def fit(self):
+        return self._fit
+
+    @property
+    def weight(self):
+        """
+        Returns the (effective) number of values in the running statistics.
+        """
+        return self._stats[0]
+
+    @property
+    def stats(self):
+        return self._stats
+
+    def update(self, xs, refit=True, weights=None):
+        """
+        Adds the values xs (ordering (z, x, y), shape (N, 3)), optionally with weights, and
+        returns the refitted FB8Distribution. With refit=False only the sufficient
+        statistics are updated.
+        """
+        xs = np.atleast_2d(xs)
+        n = len(xs)
+        lam = self.forgetting
+        forgetting_weights = lam ** np.arange(n - 1, -1, -1, dtype=np.float64)
+        if weights is None:
+            weights = forgetting_weights
+        else:
+            weights = forgetting_weights * weights
+        w, s, S = sufficient_statistics(xs, weights)
+        decay = lam ** n
+        self._stats = (decay * self._stats[0] + w,
+                       decay * self._stats[1] + s,
+                       decay * self._stats[2] + S)
+        if refit:
+            if self._fit is None:
+                # a start for the refinement on all values, including those added with
+                # refit=False and, for lambda < 1, with their forgetting weights
+                self._fit = fb8_mle(xs, fb5_only=self.fb5_only, warning='none', weights=weights)
+            self._fit = self._refine()
+        return self._fit
+
+    def _refine(self):
+        k = self._fit
+        objective = _FB8Objective(stats=self._stats)
+        x_start = np.array([k.theta, k.phi, k.psi, k.kappa, k.beta, k.eta, k.alpha, k.rho])
+        _x = _fb8_refine(objective, x_start, self.fb5_only)
+        if _x.fun <= objective(x_start[:len(_x.x)]):
+            return fb8(*_x.x)
+        return k
@@ -0,0 +1,105 @@
+"""
+Fitting of many independent datasets, e.g. one FB8 distribution per source of a
+catalog, fanned out over a pool of worker processes.
+"""
+
+from __future__ import print_function
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .distribution import fb8_mle, FB8FitTimeout
+
+
+def _fb8_mle_chunk(chunk, timeout, kwargs):
+    """
+    Fits every dataset in chunk with fb8_mle. Returns a list of (fit, seconds, message)
+    where fit is None and message is set if the fit failed.
+    """
+    retval = []
+    for xs in chunk:
+        start = time.time()
+        try:
+            fit, message = fb8_mle(xs, timeout=timeout, **kwargs), None
+        except FB8FitTimeout as e:
+            fit, message = None, str(e)
+        retval.append((fit, time.time() - start, message))
+    return retval
+
+
+def _print_progress(ndone, ntotal, elapsed):
+    print('fitted {}/{} datasets in {:.1f}s'.format(ndone, ntotal, elapsed), file=sys.stdout)
+
+
+def fb8_mle_many(datasets, workers=None, chunksize=None, timeout=None, progress=None,
+                 return_timings=False, **kwargs):
+    """
+    Generates a FB8Distribution fitted to each of datasets with fb8_mle. The fits are
+    submitted in chunks to a pool of worker processes and returned in the order of datasets.
+
+    Input:
+      - datasets: sequence of arrays of values on the sphere, each with shape (N_i, 3)
+      - workers: number of worker processes, defaults to the number of cores. With
+        workers=1 the fits run in the calling process
+      - chunksize: number of datasets per task, defaults to about four tasks per worker
+      - timeout: time limit in seconds per fit. Fits that exceed it are returned as None
+        and a warning is issued
+      - progress: a callable progress(ndone, ntotal, elapsed) that is called whenever a
+        chunk finishes, or True to print the progress
+      - return_timings: if True the wall time of every fit in seconds is returned as well
+      - all other keyword arguments are passed on to fb8_mle
+    Output:
+      - a list with a FB8Distribution (or None) for every dataset
+    Extra output:
+      - if return_timings is specified, a tuple (fits, timings) is returned
+
+    >>> from numpy.random import seed
+    >>> from sphere.distribution import fb8
+    >>> seed(3)
+    >>> xss = [fb8(0.5, 1.0, 0.2, 20., 5.).rvs(200), fb8(2.0, -1.0, 0.0, 50., 1.).rvs(200)]
+    >>> fits = fb8_mle_many(xss, workers=2, fb5_only=True)
+    >>> for fit, xs in zip(fits, xss):
+    ...     assert fit.log_likelihood(xs) == fb8_mle(xs, fb5_only=True).log_likelihood(xs)
+    """
+    datasets = list(datasets)
+    ntotal = len(datasets)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, -(-ntotal // (4 * workers)))
+    if progress is True:
+        progress = _print_progress
+    chunks = [datasets[i:i + chunksize] for i in range(0, ntotal, chunksize)]
+
+    start = time.time()
+    results = [None] * len(chunks)
+    ndone = 0
+    if workers == 1:
+        for i, chunk in enumerate(chunks):
+            results[i] = _fb8_mle_chunk(chunk, timeout, kwargs)
+            ndone += len(chunk)
+            if progress:
+                progress(ndone, ntotal, time.time() - start)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = dict(
+                (executor.submit(_fb8_mle_chunk, chunk, timeout, kwargs), i)
+                for i, chunk in enumerate(chunks))
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                ndone += len(chunks[i])
+                if progress:
+                    progress(ndone, ntotal, time.time() - start)
+
+    fits, timings = [], []
+    for i, (fit, seconds, message) in enumerate(_ for chunk in results for _ in chunk):
+        if message is not None:
+            warnings.warn('dataset {}: {}'.format(i, message), RuntimeWarning)
+        fits.append(fit)
+        timings.append(seconds)
+    if return_timings:
+        return fits, timings
+    return fits
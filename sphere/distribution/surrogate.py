@@ -0,0 +1,283 @@
+"""
+Chebyshev surrogate of the FB8 normalization over a box of parameters, e.g. kappa in
+[0, 200] and beta in [0, 100], that replaces the series in the inner loop of fits.
+
+log(c) as a function of (kappa, beta, eta, alpha, rho) is interpolated by a tensor product
+of Chebyshev polynomials. The values at the Chebyshev points of the box are computed once
+with log_normalize(), i.e. the series or its numerical fallback _nnormalize(), and turned into
+coefficients by a discrete cosine transform. Parameters whose lower and upper limits are equal
+are held fixed and cost nothing, so that a Kent (FB5) surrogate only needs a two dimensional
+grid. The gradient is the exact derivative of the interpolant, so that it is consistent with
+the values seen by an optimizer. The derivatives wrt fixed parameters are not known, hence a
+surrogate with fixed parameters only serves log(c) and the gradient is left to the series.
+
+The maximum errors of log(c) and of the gradient are certified on random points of the box
+that are independent of the nodes and stored with the coefficients. A surrogate is saved to and loaded
+from a .npz file and, once enabled with enable_normalization_surrogate(), serves
+log_normalize() and _grad_log_normalize() of all FB8Distributions inside its box while those
+outside fall back to the series.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.polynomial import chebyshev
+from scipy.fft import dctn
+
+from . import distribution as _distribution
+
+
+PARAMETERS = ('kappa', 'beta', 'eta', 'alpha', 'rho')
+
+
+# the series and its fallbacks, bypassing an enabled normalization backend
+def _log_normalize_task(xs):
+    return [_distribution.fb8(0., 0., 0., *x)._log_normalize() for x in xs]
+
+
+def _grad_log_normalize_task(xs):
+    return [_distribution.fb8(0., 0., 0., *x)._series_grad_log_normalize() for x in xs]
+
+
+def _evaluate(task, xs, workers):
+    """Returns task at every row of xs (N, 5) as an array, split over worker processes."""
+    xs = np.reshape(xs, (-1, len(PARAMETERS)))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        return np.array(task(xs))
+    chunks = [xs[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        outputs = list(executor.map(task, chunks))
+    retval = None
+    for i, output in enumerate(outputs):
+        output = np.array(output)
+        if retval is None:
+            retval = np.empty((len(xs),) + output.shape[1:])
+        retval[i::workers] = output
+    return retval
+
+
+def _log_normalizes(xs, workers):
+    """Returns log(c) at every row of xs (N, 5), split over worker processes."""
+    return _evaluate(_log_normalize_task, xs, workers)
+
+
+def _grad_log_normalizes(xs, workers):
+    """Returns the gradient (N, 5) of log(c) at every row of xs (N, 5)."""
+    return _evaluate(_grad_log_normalize_task, xs, workers)
+
+
+class ChebyshevSurrogate(object):
+    """
+    Tensor product Chebyshev interpolant of log(c) on the box [lower, upper] of
+    (kappa, beta, eta, alpha, rho), see the module docstring. Use chebyshev_surrogate() to
+    build one.
+
+    >>> from sphere.distribution import fb8
+    >>> s = chebyshev_surrogate([0., 0., 1., 0., 0.], [200., 100., 1., 0., 0.], [48, 32],
+    ...                         n_check=50, workers=1, seed=0)
+    >>> print(s.max_error < 1e-3)
+    True
+    >>> k = fb8(0.1, 0.2, 0.3, 123., 45.)
+    >>> log_c, _ = s.get(k, grad=False)
+    >>> print(abs(log_c - k.log_normalize()) < 1e-3, s.get(k, grad=True))
+    True None
+    >>> _ = enable_normalization_surrogate(s)
+    >>> print(k.log_normalize() == log_c, np.allclose(k._grad_log_normalize(), k._series_grad_log_normalize()))
+    True True
+    >>> disable_normalization_surrogate()
+    >>> print(s.get(fb8(0., 0., 0., 300., 45.), grad=False))
+    None
+    """
+    def __init__(self, lower, upper, coefficients, max_error=np.inf, max_grad_error=np.inf):
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        assert self.lower.shape == self.upper.shape == (len(PARAMETERS),)
+        assert np.all(self.lower <= self.upper)
+        self.coefficients = np.asarray(coefficients, dtype=np.float64)
+        assert self.coefficients.ndim == len(PARAMETERS)
+        self.max_error = max_error
+        self.max_grad_error = max_grad_error
+        width = self.upper - self.lower
+        # fixed parameters have a single coefficient and drop out of the evaluation
+        self._free = np.flatnonzero(np.array(self.coefficients.shape) > 1)
+        self._centre = ((self.lower + self.upper) / 2)[self._free]
+        self._scale = 2 / width[self._free]
+        c = self.coefficients.reshape([self.coefficients.shape[_] for _ in self._free])
+        self._c = c
+        self._derivatives = [chebyshev.chebder(c, axis=i) * self._scale[i]
+                             for i in range(len(self._free))]
+
+    @property
+    def degrees(self):
+        return tuple(_ - 1 for _ in self.coefficients.shape)
+
+    def contains(self, xs, tol=1e-12):
+        """Returns True for every row of xs (N, 5) inside the box."""
+        xs = np.reshape(xs, (-1, len(PARAMETERS)))
+        margin = tol * (1 + np.abs(self.upper - self.lower))
+        return np.all((xs >= self.lower - margin) & (xs <= self.upper + margin), axis=1)
+
+    @staticmethod
+    def _contract(coefficients, vanders):
+        """
+        Returns sum_j c_j prod_i T_ji(u_i) for every point, contracting one dimension
+        after the other with the Chebyshev-Vandermonde matrices (N, d_i+1).
+        """
+        n = len(vanders[0])
+        retval = np.dot(vanders[0], coefficients.reshape(coefficients.shape[0], -1))
+        for vander in vanders[1:]:
+            retval = np.einsum('nj,njr->nr', vander, retval.reshape(n, vander.shape[1], -1))
+        return retval[:, 0]
+
+    def _vanders(self, xs):
+        """Returns T_j(u_i) = cos(j*arccos(u_i)) of every free parameter."""
+        u = np.clip((xs[:, self._free] - self._centre) * self._scale, -1, 1)
+        theta = np.arccos(u)
+        return [np.cos(np.outer(theta[:, i], np.arange(self._c.shape[i])))
+                for i in range(len(self._free))]
+
+    def __call__(self, xs):
+        """
+        Returns log(c) for every row of xs (N, 5) of (kappa, beta, eta, alpha, rho), which
+        must lie inside the box.
+        """
+        xs = np.reshape(xs, (-1, len(PARAMETERS)))
+        if not len(self._free):
+            return np.full(len(xs), float(self._c))
+        return self._contract(self._c, self._vanders(xs))
+
+    @property
+    def serves_grad(self):
+        """Whether no parameter is fixed, so that the full gradient is known."""
+        return len(self._free) == len(PARAMETERS)
+
+    def grad(self, xs):
+        """
+        Returns the gradient (N, 5) of log(c) for every row of xs (N, 5). The derivatives
+        wrt fixed parameters are nan.
+        """
+        xs = np.reshape(xs, (-1, len(PARAMETERS)))
+        vanders = self._vanders(xs)
+        retval = np.full(xs.shape, np.nan)
+        for i, derivative in enumerate(self._derivatives):
+            _vanders = list(vanders)
+            _vanders[i] = vanders[i][:, :-1]
+            retval[:, self._free[i]] = self._contract(derivative, _vanders)
+        return retval
+
+    def check(self, n_points=200, workers=None, seed=None):
+        """
+        Sets max_error to the maximum absolute error of log(c) and max_grad_error to that of
+        the components of its gradient at n_points random points of the box and returns both.
+        max_grad_error is nan if a parameter is fixed, as the gradient is not served then.
+        """
+        rng = np.random.RandomState(seed)
+        xs = self.lower + (self.upper - self.lower) * rng.uniform(size=(n_points, len(PARAMETERS)))
+        self.max_error = np.max(np.abs(self(xs) - _log_normalizes(xs, workers)))
+        self.max_grad_error = np.nan
+        if self.serves_grad:
+            self.max_grad_error = np.max(np.abs(self.grad(xs) - _grad_log_normalizes(xs, workers)))
+        return self.max_error, self.max_grad_error
+
+    @property
+    def active(self):
+        return True
+
+    def get(self, k, grad=True):
+        """
+        Returns log(c) and, if grad, its gradient wrt kappa, beta, eta, alpha, rho (None
+        otherwise) for the FB8Distribution k, or None if k is outside of the box or the
+        gradient is requested and a parameter is fixed.
+        """
+        x = np.array([[k.kappa, k.beta, k.eta, k.alpha, k.rho]])
+        if not self.contains(x)[0]:
+            _distribution._count('surrogate.get', 'outside')
+            return None
+        if grad and not self.serves_grad:
+            _distribution._count('surrogate.get', 'fixed')
+            return None
+        _distribution._count('surrogate.get', 'inside')
+        return self(x)[0], self.grad(x)[0] if grad else None
+
+    def save(self, path):
+        np.savez(path, lower=self.lower, upper=self.upper, coefficients=self.coefficients,
+                 max_error=self.max_error, max_grad_error=self.max_grad_error)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            max_grad_error = float(data['max_grad_error']) if 'max_grad_error' in data else np.inf
+            return cls(data['lower'], data['upper'], data['coefficients'],
+                       float(data['max_error']), max_grad_error)
+
+    def __repr__(self):
+        return 'ChebyshevSurrogate(degrees={}, max_error={:.3g}, max_grad_error={:.3g})'.format(
+            self.degrees, self.max_error, self.max_grad_error)
+
+
+def chebyshev_surrogate(lower, upper, degrees, n_check=200, tol=None, grad_tol=None,
+                        workers=None, seed=None):
+    """
+    Returns a ChebyshevSurrogate of log(c) on the box [lower, upper] of
+    (kappa, beta, eta, alpha, rho).
+
+    Input:
+      - lower, upper: limits of the box, parameters with equal limits are held fixed
+      - degrees: degree of the polynomials in every parameter that is not fixed, in order
+      - n_check: number of random points of the box at which the errors are certified
+      - tol: if given, raise a ValueError if the certified error of log(c) exceeds tol
+      - grad_tol: if given, raise a ValueError if the certified error of the gradient
+        exceeds grad_tol
+      - workers: number of worker processes, defaults to the number of cores
+      - seed: seed of the random check points
+    """
+    lower = np.asarray(lower, dtype=np.float64)
+    upper = np.asarray(upper, dtype=np.float64)
+    free = np.flatnonzero(upper > lower)
+    if len(degrees) != len(free):
+        raise ValueError('Expected {} degrees for {}'.format(
+            len(free), ', '.join(PARAMETERS[_] for _ in free)))
+    n = np.ones(len(PARAMETERS), dtype=int)
+    n[free] = np.asarray(degrees) + 1
+    # Chebyshev points of the first kind, cos(pi*(j+1/2)/n) for j = 0...n-1
+    axes = [(lower[i] + upper[i]) / 2 +
+            (upper[i] - lower[i]) / 2 * np.cos(np.pi * (np.arange(n[i]) + 0.5) / n[i])
+            for i in range(len(PARAMETERS))]
+    grid = np.stack(np.meshgrid(*axes, indexing='ij'), -1)
+    values = _log_normalizes(grid, workers).reshape(n)
+    coefficients = dctn(values, type=2) / np.prod(n)
+    for i in free:
+        index = [slice(None)] * len(PARAMETERS)
+        index[i] = 0
+        coefficients[tuple(index)] /= 2
+    # dctn doubles every dimension, including the fixed ones
+    coefficients /= 2.**(len(PARAMETERS) - len(free))
+    retval = ChebyshevSurrogate(lower, upper, coefficients)
+    if n_check:
+        retval.check(n_check, workers, seed)
+        if tol is not None and retval.max_error > tol:
+            raise ValueError('Surrogate error {} exceeds {}'.format(retval.max_error, tol))
+        if grad_tol is not None and retval.max_grad_error > grad_tol:
+            raise ValueError('Surrogate gradient error {} exceeds {}'.format(
+                retval.max_grad_error, grad_tol))
+    return retval
+
+
+def enable_normalization_surrogate(surrogate):
+    """
+    Makes log_normalize() and _grad_log_normalize() of all FB8Distributions inside the box of
+    the ChebyshevSurrogate surrogate (or the path of a saved one) use it. Returns the surrogate.
+    """
+    if not isinstance(surrogate, ChebyshevSurrogate):
+        surrogate = ChebyshevSurrogate.load(surrogate)
+    _distribution._normalization_backend = surrogate
+    return surrogate
+
+
+def disable_normalization_surrogate():
+    """Stops using an enabled ChebyshevSurrogate, leaving any other backend enabled."""
+    if isinstance(_distribution._normalization_backend, ChebyshevSurrogate):
+        _distribution._normalization_backend = None